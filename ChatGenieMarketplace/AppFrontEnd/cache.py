@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    The cache is bounded by entry count and, when sizeof is given, by the
+    total size of the cached values; the least recently used entries are
+    evicted first."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 600,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Never worth evicting everything else for a single oversized value
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop every entry whose key matches predicate (all entries if None)"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> Any:
+        _, size, value = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+
+class ReferenceDataset:
+    """A slow-to-load DataFrame held for ttl_seconds and indexed by one column.
+
+    Only the very first read waits for the loader. Afterwards, a read of
+    expired data returns the current frame and starts a reload on a background
+    thread, so no user waits for a refresh; a failed reload keeps the old data
+    and is retried on a later read."""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], pd.DataFrame],
+        index_column: str,
+        ttl_seconds: float = 900,
+        retry_seconds: float = 60,
+    ):
+        self.name = name
+        self.loader = loader
+        self.index_column = index_column
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._frame: Optional[pd.DataFrame] = None
+        self._partitions: Dict[Any, pd.DataFrame] = {}
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loads = 0
+        self.failed_loads = 0
+        self.last_load_seconds: Optional[float] = None
+
+    def get(self) -> pd.DataFrame:
+        """Return the full dataset"""
+        self._ensure_loaded()
+        return self._frame
+
+    def partition(self, key: Any) -> pd.DataFrame:
+        """Return the rows whose index column equals key (a dict lookup, not a mask)"""
+        self._ensure_loaded()
+        partition = self._partitions.get(key)
+        if partition is None:
+            return self._frame.iloc[0:0]
+        return partition
+
+    def invalidate(self):
+        """Mark the data stale and reload it in the background"""
+        with self._lock:
+            self._expires_at = 0.0
+        if self._frame is not None:
+            self._start_background_refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rows": 0 if self._frame is None else len(self._frame),
+            "partitions": len(self._partitions),
+            "loads": self.loads,
+            "failed_loads": self.failed_loads,
+            "last_load_seconds": self.last_load_seconds,
+            "stale": time.monotonic() >= self._expires_at,
+        }
+
+    def _ensure_loaded(self):
+        if self._frame is None:
+            with self._load_lock:
+                if self._frame is None:
+                    self._load()
+            return
+        if time.monotonic() >= self._expires_at:
+            self._start_background_refresh()
+
+    def _start_background_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name=f"refresh-{self.name}", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._load_lock:
+                self._load()
+        except Exception as e:
+            logger.warning(f"Background refresh of {self.name} failed: {str(e)}")
+            with self._lock:
+                self._expires_at = time.monotonic() + self.retry_seconds
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _load(self):
+        started = time.monotonic()
+        try:
+            frame = self.loader()
+        except Exception:
+            self.failed_loads += 1
+            raise
+        partitions = {key: group for key, group in frame.groupby(self.index_column, sort=False)}
+        # Swap in the new frame and its index together
+        with self._lock:
+            self._frame, self._partitions = frame, partitions
+            self._expires_at = time.monotonic() + self.ttl_seconds
+        self.loads += 1
+        self.last_load_seconds = time.monotonic() - started
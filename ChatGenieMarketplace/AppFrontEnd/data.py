@@ -1,117 +1,504 @@
+import contextvars
+import csv
+import functools
+import io
+import json
+import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 import streamlit as st
-from databricks import sql
-from databricks.sdk import WorkspaceClient
 from databricks.sdk.core import Config
 
-from utils import get_targeted_env, get_user
+from cache import ReferenceDataset, TTLCache
+from metrics import describe_statement, metrics, traced
+from utils import get_settings, get_targeted_env, get_user, get_workspace_client
+
+logger = logging.getLogger(__name__)
 
 
 # LAKEBASE CODE
-def get_lakebase_auth_token():
-    """
-    Function to get the lakebase auth token"""
-    w = WorkspaceClient()
-    creds = w.database.generate_database_credential(
-        request_id=str(uuid.uuid4()),
-        instance_names=[get_targeted_env("LAKEBASE_INSTANCE_NAME")],
-    )
-    return creds.token
 
+# Database credentials are valid for an hour; refresh them a little before that
+CREDENTIAL_REFRESH_MARGIN = timedelta(minutes=5)
+DEFAULT_CREDENTIAL_LIFETIME = timedelta(hours=1)
+
+_credential = None
+_credential_lock = threading.Lock()
 
-conn = None
 
+def get_lakebase_auth_token():
+    """
+    Function to get the lakebase auth token. The token is cached and only minted again
+    shortly before it expires."""
+    global _credential
+    with _credential_lock:
+        now = datetime.now(timezone.utc)
+        if _credential is not None and now < _credential[1] - CREDENTIAL_REFRESH_MARGIN:
+            return _credential[0]
+
+        w = get_workspace_client()
+        with metrics.span("lakebase.credential"):
+            creds = w.database.generate_database_credential(
+                request_id=str(uuid.uuid4()),
+                instance_names=[get_settings().lakebase_instance_name],
+            )
+        try:
+            expires_at = datetime.fromisoformat(creds.expiration_time)
+        except (TypeError, ValueError):
+            expires_at = now + DEFAULT_CREDENTIAL_LIFETIME
+        _credential = (creds.token, expires_at)
+        return creds.token
+
+
+@functools.lru_cache(maxsize=None)
+def _traced_cursor_class():
+    """psycopg2 cursor class recording a lakebase.* span for every statement and fetch"""
+    import psycopg2.extensions
+
+    class TracedCursor(psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            with metrics.span("lakebase.execute", statement=describe_statement(query)) as span:
+                result = super().execute(query, vars)
+                if self.rowcount >= 0:
+                    span.add_rows(self.rowcount)
+                return result
+
+        def executemany(self, query, vars_list):
+            with metrics.span("lakebase.executemany", statement=describe_statement(query)) as span:
+                result = super().executemany(query, vars_list)
+                if self.rowcount >= 0:
+                    span.add_rows(self.rowcount)
+                return result
+
+        def fetchmany(self, size=None):
+            with metrics.span("lakebase.fetch", cursor=self.name or "client") as span:
+                rows = super().fetchmany(size) if size is not None else super().fetchmany()
+                span.add_rows(len(rows))
+                return rows
+
+        def copy_expert(self, sql, file, size=8192):
+            with metrics.span("lakebase.copy", statement=describe_statement(sql)) as span:
+                result = super().copy_expert(sql, file, size)
+                if self.rowcount >= 0:
+                    span.add_rows(self.rowcount)
+                return result
+
+    return TracedCursor
+
+
+class LakebaseConnectionPool:
+    """Thread-safe pool of Lakebase connections shared by every Streamlit session.
+
+    Connections are opened with the cached credential (existing connections stay
+    valid after it rotates), checked with SELECT 1 when they were idle for a while,
+    and idle connections above min_size are closed after max_idle seconds."""
+
+    def __init__(
+        self,
+        database,
+        min_size=1,
+        max_size=10,
+        health_check_after=30,
+        max_idle=300,
+        checkout_timeout=30,
+    ):
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self._idle = []  # (connection, last used) pairs, most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.connections_created = 0
+        self.checkouts = 0
+        self.waits = 0
+
+    def _connect(self):
+        import psycopg2
 
-def get_lakebase_connection():
-    global conn
-    if conn is not None and not conn.closed:
+        settings = get_settings()
+        user = get_user().user_name
+        password = get_lakebase_auth_token()
+        with metrics.span("lakebase.connect", database=self.database):
+            conn = psycopg2.connect(
+                host=settings.lakebase_host,
+                port=settings.lakebase_port,
+                user=user,
+                password=password,
+                database=self.database,
+                sslmode="require",
+                cursor_factory=_traced_cursor_class(),
+            )
+        self.connections_created += 1
         return conn
 
-    # Check if Lakebase is configured before attempting connection
-    lakebase_host = get_targeted_env("LAKEBASE_HOST", default=None)
-    if not lakebase_host:
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting up to checkout_timeout when the pool is full"""
+        with self._cond:
+            conn = None
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    break
+                self.waits += 1
+                if not self._cond.wait(self.checkout_timeout):
+                    raise TimeoutError(
+                        f"No Lakebase connection available after {self.checkout_timeout} seconds"
+                    )
+            self._in_use += 1
+            self.checkouts += 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._close(conn)
+                conn = None
+            return conn or self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        import psycopg2.extensions
+
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._close(conn)
+
+        now = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if not conn.closed:
+                self._idle.append((conn, now))
+            # Close connections idle for too long, keeping min_size open
+            while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+                stale, _ = self._idle.pop(0)
+                self._close(stale)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            return {
+                "database": self.database,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "utilization": self._in_use / self.max_size,
+                "connections_created": self.connections_created,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+            }
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_lakebase_pool(sync=False):
+    """Return the process-wide pool for the app database (or the synced-table database
+    when sync is True), or None when Lakebase is not configured"""
+    settings = get_settings()
+    if not settings.lakebase_host:
         return None
 
+    key = "LAKEBASE_SYNC_DATABASE" if sync else "LAKEBASE_DATABASE"
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = LakebaseConnectionPool(
+                database=settings.lakebase_sync_database if sync else settings.lakebase_database,
+                min_size=settings.lakebase_pool_min_size,
+                max_size=settings.lakebase_pool_max_size,
+            )
+            metrics.register_gauge(
+                "lakebase_sync_pool" if sync else "lakebase_pool", _pools[key].stats
+            )
+        return _pools[key]
+
+
+@contextmanager
+def lakebase_connection(sync=False):
+    """Check out a pooled Lakebase connection for the duration of the block"""
+    pool = get_lakebase_pool(sync)
+    if pool is None:
+        raise RuntimeError("Lakebase is not configured (LAKEBASE_HOST is not set)")
+
+    conn = pool.getconn()
     try:
-        import psycopg2
+        yield conn
+    finally:
+        pool.putconn(conn)
 
-        """Function to get a connection to the lakebase database"""
-        conn = psycopg2.connect(
-            host=lakebase_host,
-            port=get_targeted_env("LAKEBASE_PORT", 5432),
-            user=get_user().user_name,
-            password=get_lakebase_auth_token(),
-            database=get_targeted_env("LAKEBASE_DATABASE", default="databricks_postgres"),
-            sslmode="require",
-        )
-        return conn
-    except Exception as e:
-        # Return None if connection fails
-        return None
 
+def get_catalog_schema():
+    return f"{{.catalog}}.{{.schema}}"
 
-# Don't connect automatically - let functions handle connection when needed
-# conn = get_lakebase_connection()
 
-conn_sync = None
+class WarehouseConnectionPool:
+    """SQL warehouse sessions kept open and reused across queries and Streamlit sessions.
 
+    Opening a warehouse session takes seconds, so idle sessions are kept for
+    max_session_age seconds; a session that raised while in use is discarded."""
 
-def get_lakebase_connection_sync():
-    global conn_sync
-    if conn_sync is not None and not conn_sync.closed:
-        return conn_sync
+    def __init__(self, max_idle=4, max_session_age=1800):
+        self.max_idle = max_idle
+        self.max_session_age = max_session_age
+        self._idle = []  # (connection, opened at) pairs
+        self._lock = threading.Lock()
+        self.sessions_opened = 0
+        self.reuses = 0
 
-    # Check if Lakebase is configured before attempting connection
-    lakebase_host = get_targeted_env("LAKEBASE_HOST", default=None)
-    if not lakebase_host:
-        return None
+    def _connect(self):
+        # Imported on first use so pages that never touch the warehouse skip the connector
+        from databricks import sql
 
+        cfg = Config()  # Pull environment variables for auth
+        with metrics.span("warehouse.connect"):
+            connection = sql.connect(
+                server_hostname=cfg.host,
+                http_path=f"/sql/1.0/warehouses/{get_settings().warehouse_id}",
+                credentials_provider=lambda: cfg.authenticate,
+            )
+        self.sessions_opened += 1
+        return connection, time.monotonic()
+
+    def getconn(self):
+        with self._lock:
+            while self._idle:
+                connection, opened_at = self._idle.pop()
+                if connection.open and time.monotonic() - opened_at < self.max_session_age:
+                    self.reuses += 1
+                    return connection, opened_at
+                self._close(connection)
+        return self._connect()
+
+    def putconn(self, connection, opened_at, discard=False):
+        with self._lock:
+            if discard or not connection.open or len(self._idle) >= self.max_idle:
+                self._close(connection)
+            else:
+                self._idle.append((connection, opened_at))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "sessions_opened": self.sessions_opened,
+                "reuses": self.reuses,
+            }
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+warehouse_pool = WarehouseConnectionPool()
+metrics.register_gauge("warehouse_pool", warehouse_pool.stats)
+
+
+@contextmanager
+def warehouse_cursor():
+    """Cursor on a pooled SQL warehouse session for the duration of the block"""
+    connection, opened_at = warehouse_pool.getconn()
     try:
-        import psycopg2
-
-        """Function to get a connection to the lakebase database"""
-        conn = psycopg2.connect(
-            host=lakebase_host,
-            port=get_targeted_env("LAKEBASE_PORT", 5432),
-            user=get_user().user_name,
-            password=get_lakebase_auth_token(),
-            database=get_targeted_env("LAKEBASE_SYNC_DATABASE", default="databricks_postgres"),
-            sslmode="require",
+        with connection.cursor() as cursor:
+            yield cursor
+    except BaseException:
+        warehouse_pool.putconn(connection, opened_at, discard=True)
+        raise
+    warehouse_pool.putconn(connection, opened_at)
+
+
+def arrow_to_pandas(table) -> pd.DataFrame:
+    """Convert an Arrow table to pandas without keeping two copies in memory.
+    Numeric columns without nulls are converted zero-copy; the table must not be used afterwards."""
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def sql_query(query: str, parameters: dict = None, as_arrow: bool = False):
+    """Function to accept a query and return pandas dataframe (or an Arrow table when
+    as_arrow is True). Values in parameters are bound to the :name markers in the query
+    by the warehouse, never formatted into the SQL text."""
+    with metrics.span("warehouse.query", statement=describe_statement(query)) as span:
+        with warehouse_cursor() as cursor:
+            cursor.execute(query, parameters=parameters)
+            table = cursor.fetchall_arrow()
+        span.add_rows(table.num_rows)
+        span.add_bytes(table.nbytes)
+    return table if as_arrow else arrow_to_pandas(table)
+
+
+def sql_query_batches(query: str, parameters: dict = None, batch_size: int = 100_000):
+    """Stream a query result as Arrow tables of at most batch_size rows.
+    The warehouse session stays checked out until the generator is exhausted or closed."""
+    # Timed by hand: a span held open across yields would leak into the caller's context
+    started = time.perf_counter()
+    rows = size = 0
+    status = "error"
+    try:
+        with warehouse_cursor() as cursor:
+            cursor.execute(query, parameters=parameters)
+            while True:
+                batch = cursor.fetchmany_arrow(batch_size)
+                if batch.num_rows == 0:
+                    status = "ok"
+                    return
+                rows += batch.num_rows
+                size += batch.nbytes
+                yield batch
+    except GeneratorExit:
+        status = "ok"
+        raise
+    finally:
+        metrics.record(
+            "warehouse.query_batches",
+            time.perf_counter() - started,
+            status=status,
+            rows=rows,
+            size=size,
+            statement=describe_statement(query),
         )
-        return conn
-    except Exception as e:
-        # Return None if connection fails
-        return None
 
 
-# Don't connect automatically - let functions handle connection when needed
-# conn_sync = get_lakebase_connection_sync()
+# Rows fetched per round trip by the server-side cursor readers
+LAKEBASE_FETCH_SIZE = int(get_targeted_env("LAKEBASE_FETCH_SIZE", 10_000))
 
 
-def get_catalog_schema():
-    return f"{{.catalog}}.{{.schema}}"
-
+def _iter_lakebase_rows(query, params=None, batch_size=LAKEBASE_FETCH_SIZE, sync=False, stream=True):
+    """
+    Yield (column names, row tuples) batches of a query.
 
-def sql_query(query: str) -> pd.DataFrame:
-    """Function to accept a query and return pandas dataframe"""
-    cfg = Config()  # Pull environment variables for auth
-    with sql.connect(
-        server_hostname=cfg.host,
-        http_path=f"/sql/1.0/warehouses/{get_targeted_env('DATABRICKS_WAREHOUSE_ID')}",
-        credentials_provider=lambda: cfg.authenticate,
-    ) as connection:
-        with connection.cursor() as cursor:
-            cursor.execute(query)
-            return cursor.fetchall_arrow().to_pandas()
+    With stream, rows are read batch_size at a time through a server-side cursor
+    (DECLARE/FETCH), so large scans never sit in client memory at once. Without it,
+    one execute and fetchall on a client-side cursor saves those round trips for
+    small, bounded reads.
+    """
+    with lakebase_connection(sync=sync) as conn:
+        if not stream:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                columns = [desc[0].upper() for desc in cursor.description]
+                yield columns, cursor.fetchall()
+            return
+
+        with conn.cursor(name=f"reader_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                # Named cursors only describe their columns after the first fetch
+                columns = [desc[0].upper() for desc in cursor.description]
+                yield columns, rows
+                # A short batch is the last one; no need for a FETCH that returns nothing
+                if len(rows) < batch_size:
+                    return
+
+
+def iter_lakebase_batches(query, params=None, batch_size=LAKEBASE_FETCH_SIZE, sync=False):
+    """Stream a Lakebase SELECT as dataframes of at most batch_size rows"""
+    for columns, rows in _iter_lakebase_rows(query, params, batch_size, sync):
+        if rows:
+            yield pd.DataFrame(dict(zip(columns, map(list, zip(*rows)))), columns=columns)
+
+
+def lakebase_query(query, params=None, sync=False, batch_size=LAKEBASE_FETCH_SIZE, stream=False) -> pd.DataFrame:
+    """Run a Lakebase SELECT with psycopg2 bind parameters (%(name)s markers) and return a dataframe.
+
+    Small, bounded reads use a single client-side fetch. With stream, rows come through
+    a server-side cursor and are appended to per-column lists one batch at a time, so
+    the full result never exists as row tuples and a frame at once; use it for scans
+    of unbounded size."""
+    columns, values = [], []
+    for columns, rows in _iter_lakebase_rows(query, params, batch_size, sync, stream):
+        if not values:
+            values = [[] for _ in columns]
+        for column_values, batch_values in zip(values, zip(*rows)):
+            column_values.extend(batch_values)
+    return pd.DataFrame(dict(zip(columns, values)), columns=columns)
 
 
 catalog_schema = get_catalog_schema()
 
 
-def syched_job_data():
-    conn = get_lakebase_connection_sync()
+def _job_data_table():
+    """Fully qualified, quoted name of the synced job data table"""
+    settings = get_settings()
+    return (
+        f'"{settings.lakebase_sync_database}"'
+        f'."{settings.lakebase_sync_schema}"'
+        f'."{settings.lakebase_sync_job_data_table}"'
+    )
+
+
+def _job_filters(formation, spud_date_from, spud_date_to, marker, quote=lambda column: column):
+    """WHERE clause and parameters restricting job rows to a formation and spud date window.
+    marker formats a parameter name into the driver's bind syntax, quote a column name."""
+    conditions = []
+    params = {}
+    for name, column, operator, value in [
+        ("formation", "PRODUCING_FORMATION", "=", formation),
+        ("spud_date_from", "SPUD_DATE", ">=", spud_date_from),
+        ("spud_date_to", "SPUD_DATE", "<", spud_date_to),
+    ]:
+        if value is not None:
+            conditions.append(f"{quote(column)} {operator} {marker(name)}")
+            params[name] = value
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def syched_job_data(formation=None, spud_date_from=None, spud_date_to=None):
+    """Latest wells per formation from the synced job data table. The formation and
+    spud date window are pushed down into the query as bind parameters."""
+    where, params = _job_filters(
+        formation,
+        spud_date_from,
+        spud_date_to,
+        marker=lambda name: f"%({name})s",
+        quote=lambda column: f'"{column}"',
+    )
     query = f"""
         SELECT
             *
@@ -120,25 +507,57 @@ def syched_job_data():
                 *,
                 dense_rank() over (PARTITION BY "PRODUCING_FORMATION" order by "SPUD_DATE" desc) as "SPUD_DATE_RANK"
             FROM
-                "{get_targeted_env('LAKEBASE_SYNC_DATABASE')}"."{get_targeted_env('LAKEBASE_SYNC_SCHEMA')}"."{get_targeted_env('LAKEBASE_SYNC_JOB_DATA_TABLE')}"
-            )
+                {_job_data_table()}
+            {where}
+            ) ranked
         WHERE "SPUD_DATE_RANK" < 10
         ORDER BY
         "PRODUCING_FORMATION", "SPUD_DATE" desc;
     """
-    with conn.cursor() as cursor:
-        cursor.execute(query)
-        columns = [desc[0].upper() for desc in cursor.description]
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows, columns=columns)
+    return lakebase_query(query, params, sync=True)
+
+
+def _job_data_index_name():
+    return f"{get_settings().lakebase_sync_job_data_table}_formation_spud_date_idx"
+
+
+def job_data_index_ddl():
+    """Index serving the formation filter and spud date ordering of syched_job_data"""
+    return (
+        f'CREATE INDEX IF NOT EXISTS "{_job_data_index_name()}" '
+        f'ON {_job_data_table()} ("PRODUCING_FORMATION", "SPUD_DATE" DESC)'
+    )
+
 
+def ensure_job_data_index():
+    """
+    Create the job data index if it is missing; if the app principal may not,
+    log the DDL to run instead. The index is looked up first so a running app
+    does not take the table lock CREATE INDEX needs on every start.
+    """
+    index = f'"{get_settings().lakebase_sync_schema}"."{_job_data_index_name()}"'
+    try:
+        with lakebase_connection(sync=True) as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (index,))
+            if not cursor.fetchone()[0]:
+                cursor.execute(job_data_index_ddl())
+                logger.info("Created the job data index %s", index)
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.warning(
+            f"Could not create the job data index ({str(e)}). Recommended DDL: {job_data_index_ddl()}"
+        )
+        return False
 
-print("Done with query")
 
 # PULL IN JOB PHASE QUERY FOR DAYS VS DEPTH CHART
 
 
-def syched_job_phase_data():
+def syched_job_phase_data(formation=None, spud_date_from=None, spud_date_to=None):
+    """Job phases of the latest wells per formation, with the formation and spud date
+    window pushed down to the warehouse as named parameters."""
+    where, params = _job_filters(formation, spud_date_from, spud_date_to, lambda name: f":{name}")
     return sql_query(
         f"""
             SELECT
@@ -150,26 +569,55 @@ def syched_job_phase_data():
                 SUM(DURATION_DAYS) over (PARTITION BY API_NUMBER order by START_TIME) as CUMULATIVE_DAYS,
                 END_DEPTH*-1 as PLOTTING_DEPTH
             FROM
-                {catalog_schema}.drilling_job_phase_silver) WHERE SPUD_DATE_RANK <= 10
+                {catalog_schema}.drilling_job_phase_silver
+            {where}) WHERE SPUD_DATE_RANK <= 10
             ORDER BY
             PRODUCING_FORMATION, SPUD_DATE, API_NUMBER, START_TIME ASC;
-        """
+        """,
+        parameters=params,
     )
 
 
+# Reference datasets change only when the sync pipelines run, so they are shared
+# by every session and refreshed in the background. Each formation is loaded
+# (and refreshed) on its own with the formation pushed down into the query.
+REFERENCE_DATA_TTL = int(get_targeted_env("REFERENCE_DATA_TTL", 900))
+
+_formation_datasets = {}
+_formation_datasets_lock = threading.Lock()
+
+
+def _formation_dataset(name, loader, formation):
+    with _formation_datasets_lock:
+        key = (name, formation)
+        if key not in _formation_datasets:
+            _formation_datasets[key] = ReferenceDataset(
+                f"{name}:{formation}",
+                functools.partial(loader, formation=formation),
+                "PRODUCING_FORMATION",
+                ttl_seconds=REFERENCE_DATA_TTL,
+            )
+        return _formation_datasets[key]
+
+
 def filtered_job_data(formation_):
-    job_data = syched_job_data()
     "Filters the job data to the particular formation of interest"
-    _df = job_data[job_data["PRODUCING_FORMATION"] == formation_]
-    return _df
+    # Shallow copy so callers cannot rename or add columns on the shared frame
+    return _formation_dataset("job_data", syched_job_data, formation_).partition(formation_).copy(deep=False)
 
 
 def filtered_jobphase_data(formation_):
-    job_phase_data = syched_job_phase_data()
-    print("Getting filtered jobphase data")
     "Filters the job data to the particular formation of interest"
-    _df = job_phase_data[job_phase_data["PRODUCING_FORMATION"] == formation_]
-    return _df
+    return _formation_dataset("job_phase_data", syched_job_phase_data, formation_).partition(formation_).copy(deep=False)
+
+
+def invalidate_reference_data():
+    """Reload the cached job and job phase reference data in the background; returns how many datasets"""
+    with _formation_datasets_lock:
+        datasets = list(_formation_datasets.values())
+    for dataset in datasets:
+        dataset.invalidate()
+    return len(datasets)
 
 
 def load_initial_cost_dataframe(cost_accts):
@@ -187,38 +635,242 @@ def load_initial_cost_dataframe(cost_accts):
     return df
 
 
+# MODEL SERVING
+COST_ENDPOINT = "drilling-cost-endpoint"
+TIME_ENDPOINT = "drilling-job-time-endpoint"
+
+COST_FEATURES = [
+    "PRODUCING_FORMATION",
+    "GEO_RISK_INDEX",
+    "DAYS_FROM_SPUD",
+    "TOTAL_DEPTH",
+    "COST_DESC",
+]
+TIME_FEATURES = [
+    "PRODUCING_FORMATION",
+    "GEO_RISK_INDEX",
+    "JOB_PHASE",
+    "JOB_SUB_PHASE",
+    "JOB_PHASE_DEPTH",
+]
+
+# Columns describing one drilling scenario
+SCENARIO_COLUMNS = [
+    "PRODUCING_FORMATION",
+    "GEO_RISK_INDEX",
+    "SURFACE_LENGTH",
+    "INTER_LENGTH",
+    "PRODUCTION_LENGTH",
+]
+
+# Maximum number of rows sent in a single serving request
+SERVING_BATCH_SIZE = int(get_targeted_env("SERVING_BATCH_SIZE", 2000))
+
+
+def query_endpoint(endpoint, rows, features, batch_size=SERVING_BATCH_SIZE):
+    """Score rows on a serving endpoint in requests of at most batch_size rows and
+    return the predictions in row order"""
+    w = get_workspace_client()
+    predictions = []
+    for start in range(0, len(rows), batch_size):
+        records = rows.iloc[start : start + batch_size][features].to_dict(orient="records")
+        with metrics.span("serving.query", endpoint=endpoint) as span:
+            response = w.serving_endpoints.query(name=endpoint, dataframe_records=records)
+            span.add_rows(len(records))
+            # JSON sizes of the request and response bodies
+            span.add_bytes(len(json.dumps(records, default=str)) + len(json.dumps(response.predictions, default=str)))
+        predictions.extend(response.predictions)
+    return predictions
+
+
+def cost_feature_rows(scenarios):
+    """One cost model row per scenario and cost account"""
+    rows = scenarios.assign(
+        DAYS_FROM_SPUD=0,
+        TOTAL_DEPTH=scenarios["SURFACE_LENGTH"]
+        + scenarios["INTER_LENGTH"]
+        + scenarios["PRODUCTION_LENGTH"],
+    )
+    return rows.merge(pd.DataFrame({"COST_DESC": cost_accts}), how="cross")
+
+
+def time_feature_rows(scenarios):
+    """One job time model row per scenario and job sub phase"""
+    rows = scenarios.merge(
+        pd.DataFrame(
+            {
+                "JOB_PHASE": job_phases,
+                "JOB_SUB_PHASE": job_sub_phases,
+                "DEPTH_COLUMN": job_phase_depth_columns,
+            }
+        ),
+        how="cross",
+    )
+    # The rig move has no depth; every other phase takes its casing length
+    rows["JOB_PHASE_DEPTH"] = 0
+    for column in ["SURFACE_LENGTH", "INTER_LENGTH", "PRODUCTION_LENGTH"]:
+        mask = rows["DEPTH_COLUMN"] == column
+        rows.loc[mask, "JOB_PHASE_DEPTH"] = rows.loc[mask, column]
+    return rows.drop(columns="DEPTH_COLUMN")
+
+
+# Predictions depend only on the scenario and the served model, so they are cached
+# per scenario until the endpoint starts serving a different model version
+PREDICTION_CACHE_TTL = int(get_targeted_env("PREDICTION_CACHE_TTL", 24 * 3600))
+PREDICTION_CACHE_PERSIST = get_targeted_env("PREDICTION_CACHE_PERSIST", "false").lower() == "true"
+MODEL_VERSION_TTL = int(get_targeted_env("MODEL_VERSION_TTL", 60))
+
+prediction_cache = TTLCache(
+    max_entries=int(get_targeted_env("PREDICTION_CACHE_MAX_ENTRIES", 20000)),
+    ttl_seconds=PREDICTION_CACHE_TTL,
+)
+_endpoint_versions = TTLCache(max_entries=16, ttl_seconds=MODEL_VERSION_TTL)
+metrics.register_gauge("prediction_cache", prediction_cache.stats)
+
+
+_last_endpoint_versions = {}
+
+
+def get_endpoint_version(endpoint):
+    """Identifier of the model version(s) an endpoint serves, looked up at most every
+    MODEL_VERSION_TTL seconds. Cached predictions of older versions are dropped when it changes.
+    A failed lookup keeps the last known version and drops nothing."""
+    version = _endpoint_versions.get(endpoint)
+    if version is not None:
+        return version
+
+    try:
+        config = get_workspace_client().serving_endpoints.get(name=endpoint).config
+        entities = (config.served_entities or []) if config else []
+        version = ",".join(
+            sorted(f"{entity.entity_name}/{entity.entity_version}" for entity in entities)
+        ) or str(getattr(config, "config_version", "unknown"))
+    except Exception as e:
+        logger.warning(f"Could not read the model version of {endpoint}: {str(e)}")
+        version = _last_endpoint_versions.get(endpoint, "unknown")
+        _endpoint_versions.set(endpoint, version)
+        return version
+
+    _endpoint_versions.set(endpoint, version)
+    if _last_endpoint_versions.get(endpoint) != version:
+        _last_endpoint_versions[endpoint] = version
+        prediction_cache.invalidate(lambda key: key[0] == endpoint and key[1] != version)
+    return version
+
+
+def _scenario_keys(endpoint, version, scenarios):
+    return [
+        (
+            endpoint,
+            version,
+            formation,
+            round(float(geo_risk_index), 2),
+            int(surface_length),
+            int(inter_length),
+            int(production_length),
+        )
+        for formation, geo_risk_index, surface_length, inter_length, production_length in scenarios[
+            SCENARIO_COLUMNS
+        ].itertuples(index=False)
+    ]
+
+
+def _load_persisted_predictions(keys):
+    """Predictions for keys stored in Lakebase by any app replica"""
+    ensure_lakebase_schema()
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT endpoint, model_version, formation, geo_risk_index,
+                   surface_length, inter_length, production_length, predictions
+            FROM prediction_cache
+            WHERE (endpoint, model_version, formation, geo_risk_index,
+                   surface_length, inter_length, production_length) IN %s
+              AND created_at > CURRENT_TIMESTAMP - make_interval(secs => %s)
+        """,
+            (tuple(keys), PREDICTION_CACHE_TTL),
+        )
+        rows = cursor.fetchall()
+        conn.commit()
+    return {(*row[:3], round(float(row[3]), 2), *row[4:7]): row[7] for row in rows}
+
+
+def _persist_predictions(entries):
+    from psycopg2.extras import Json, execute_values
+
+    ensure_lakebase_schema()
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO prediction_cache (endpoint, model_version, formation, geo_risk_index,
+                surface_length, inter_length, production_length, predictions)
+            VALUES %s
+            ON CONFLICT (endpoint, model_version, formation, geo_risk_index,
+                surface_length, inter_length, production_length)
+            DO UPDATE SET predictions = EXCLUDED.predictions, created_at = CURRENT_TIMESTAMP
+        """,
+            [(*key, Json(predictions)) for key, predictions in entries.items()],
+        )
+        conn.commit()
+
+
+def predict_scenarios(endpoint, scenarios, build_rows, features, batch_size=SERVING_BATCH_SIZE):
+    """
+    Predictions of endpoint for each scenario (a list per scenario, in order).
+
+    Scenarios found in prediction_cache (or, with PREDICTION_CACHE_PERSIST, in
+    the Lakebase prediction_cache table) are not sent to the endpoint; the rest
+    are scored together with build_rows and query_endpoint.
+    """
+    version = get_endpoint_version(endpoint)
+    keys = _scenario_keys(endpoint, version, scenarios)
+    found = {key: prediction_cache.get(key) for key in set(keys)}
+    missing = [key for key, predictions in found.items() if predictions is None]
+
+    if missing and PREDICTION_CACHE_PERSIST:
+        try:
+            persisted = _load_persisted_predictions(missing)
+        except Exception as e:
+            logger.warning(f"Could not read persisted predictions: {str(e)}")
+            persisted = {}
+        for key, predictions in persisted.items():
+            found[key] = predictions
+            prediction_cache.set(key, predictions)
+        missing = [key for key in missing if key not in persisted]
+
+    if missing:
+        missing_scenarios = pd.DataFrame([key[2:] for key in missing], columns=SCENARIO_COLUMNS)
+        predictions = query_endpoint(endpoint, build_rows(missing_scenarios), features, batch_size)
+        rows_per_scenario = len(predictions) // len(missing)
+        scored = {
+            key: predictions[i * rows_per_scenario : (i + 1) * rows_per_scenario]
+            for i, key in enumerate(missing)
+        }
+        for key, scenario_predictions in scored.items():
+            found[key] = scenario_predictions
+            prediction_cache.set(key, scenario_predictions)
+        if PREDICTION_CACHE_PERSIST:
+            try:
+                _persist_predictions(scored)
+            except Exception as e:
+                logger.warning(f"Could not persist predictions: {str(e)}")
+
+    return [found[key] for key in keys]
+
+
 def update_cost_table(
     choice, geo_risk_index, surface_length, inter_length, production_length
 ):
     """Function to update the cost table with the appropriate paramters that will be used in the model.  T
     This function needs to be modified toc all the API and return the predictions."""
-    w = WorkspaceClient()
-
-    df = pd.DataFrame(
-        {
-            "PRODUCING_FORMATION": choice,
-            "GEO_RISK_INDEX": geo_risk_index,
-            "DAYS_FROM_SPUD": 0,
-            "TOTAL_DEPTH": surface_length + inter_length + production_length,
-            "COST_DESC": cost_accts,
-        }
-    )
-
-    df = df[
-        [
-            "PRODUCING_FORMATION",
-            "GEO_RISK_INDEX",
-            "DAYS_FROM_SPUD",
-            "TOTAL_DEPTH",
-            "COST_DESC",
-        ]
-    ].to_dict(orient="records")
-    response = w.serving_endpoints.query(
-        name="drilling-cost-endpoint", dataframe_records=df
+    scenario = pd.DataFrame(
+        [[choice, geo_risk_index, surface_length, inter_length, production_length]],
+        columns=SCENARIO_COLUMNS,
     )
+    predictions = predict_scenarios(COST_ENDPOINT, scenario, cost_feature_rows, COST_FEATURES)[0]
     depth1 = surface_length + inter_length + production_length
 
-    predictions = response.predictions
     df = pd.DataFrame(
         {
             "PRODUCING_FORMATION": choice,
@@ -277,6 +929,20 @@ job_sub_phases = [
     "CEMENT",
 ]
 
+# Scenario column holding the depth of each job sub phase
+job_phase_depth_columns = [
+    None,
+    "SURFACE_LENGTH",
+    "SURFACE_LENGTH",
+    "SURFACE_LENGTH",
+    "INTER_LENGTH",
+    "INTER_LENGTH",
+    "INTER_LENGTH",
+    "PRODUCTION_LENGTH",
+    "PRODUCTION_LENGTH",
+    "PRODUCTION_LENGTH",
+]
+
 
 def load_initial_time_dataframe(job_phases_, job_sub_phases_):
     """Initial creation of empty dataframe to fill the time prediction accordian"""
@@ -299,41 +965,12 @@ def update_time_table(
 ):
     """Function to update the cotimest table with the appropriate paramters that will be used in the model.
     This function needs to be modified to call the API and return the predictions."""
-
-    w = WorkspaceClient()
-    df = pd.DataFrame(
-        {
-            "PRODUCING_FORMATION": choice,
-            "GEO_RISK_INDEX": geo_risk_index,
-            "JOB_PHASE": job_phases,
-            "JOB_SUB_PHASE": job_sub_phases,
-            "JOB_PHASE_DEPTH": [
-                0,
-                surface_length,
-                surface_length,
-                surface_length,
-                inter_length,
-                inter_length,
-                inter_length,
-                production_length,
-                production_length,
-                production_length,
-            ],
-        }
+    scenario = pd.DataFrame(
+        [[choice, geo_risk_index, surface_length, inter_length, production_length]],
+        columns=SCENARIO_COLUMNS,
     )
-    df = df[
-        [
-            "PRODUCING_FORMATION",
-            "GEO_RISK_INDEX",
-            "JOB_PHASE",
-            "JOB_SUB_PHASE",
-            "JOB_PHASE_DEPTH",
-        ]
-    ].to_dict(orient="records")
-    response = w.serving_endpoints.query(
-        name="drilling-job-time-endpoint", dataframe_records=df
-    )
-    predictions = response.predictions
+    rows = time_feature_rows(scenario)
+    predictions = predict_scenarios(TIME_ENDPOINT, scenario, time_feature_rows, TIME_FEATURES)[0]
 
     df = pd.DataFrame(
         {
@@ -341,21 +978,7 @@ def update_time_table(
             "GEO_RISK_INDEX": geo_risk_index,
             "JOB_PHASE": job_phases,
             "JOB_SUB_PHASE": job_sub_phases,
-            "JOB_PHASE_DEPTH": [
-                f"{value:,}"
-                for value in [
-                    0,
-                    surface_length,
-                    surface_length,
-                    surface_length,
-                    inter_length,
-                    inter_length,
-                    inter_length,
-                    production_length,
-                    production_length,
-                    production_length,
-                ]
-            ],
+            "JOB_PHASE_DEPTH": [f"{value:,}" for value in rows["JOB_PHASE_DEPTH"]],
             "DOL_PREDICTIONS": [f"{value:,.2f}" for value in predictions],
         }
     )
@@ -368,21 +991,138 @@ time_df = load_initial_time_dataframe(
 )
 
 
+#################### COMBINED ESTIMATION
+# Shared by every session; each estimate uses two workers at most
+_estimation_executor = ThreadPoolExecutor(
+    max_workers=int(get_targeted_env("ESTIMATION_MAX_WORKERS", 8)),
+    thread_name_prefix="estimate",
+)
+
+
+def _timed(name, function, *args):
+    """Run function in an estimation.<name> span and return (result, elapsed seconds, exception)"""
+    started = time.perf_counter()
+    try:
+        with metrics.span(f"estimation.{name}"):
+            return function(*args), time.perf_counter() - started, None
+    except Exception as e:
+        return None, time.perf_counter() - started, e
+
+
+@traced("estimation.estimate_well")
+def estimate_well(
+    choice, geo_risk_index, surface_length, inter_length, production_length, on_complete=None
+):
+    """
+    Run the cost and job time predictions concurrently.
+
+    Returns a dict with cost_table, total_cost, time_table and dol (None for a
+    prediction that failed), timings (seconds per prediction) and errors (the
+    exception per failed prediction), so one failure does not lose the other
+    result. on_complete(name, completed, total) is called from the calling
+    thread as each prediction finishes, which makes it safe for Streamlit calls.
+    """
+    args = (choice, geo_risk_index, surface_length, inter_length, production_length)
+    # Each worker runs in a copy of this context so its spans join the caller's trace
+    futures = {
+        _estimation_executor.submit(
+            contextvars.copy_context().run, _timed, name, function, *args
+        ): name
+        for name, function in (("cost", update_cost_table), ("time", update_time_table))
+    }
+
+    estimate = {
+        "cost_table": None,
+        "total_cost": None,
+        "time_table": None,
+        "dol": None,
+        "timings": {},
+        "errors": {},
+    }
+    for completed, future in enumerate(as_completed(futures), start=1):
+        name = futures[future]
+        result, elapsed, error = future.result()
+        estimate["timings"][name] = elapsed
+        if error is not None:
+            logger.error(f"{name} prediction failed: {str(error)}")
+            estimate["errors"][name] = error
+        elif name == "cost":
+            estimate["cost_table"], estimate["total_cost"] = result
+        else:
+            estimate["time_table"], estimate["dol"] = result
+        if on_complete is not None:
+            on_complete(name, completed, len(futures))
+    return estimate
+
+
+#################### SCENARIO SWEEPS
+def scenario_grid(
+    formations, geo_risk_indexes, surface_lengths, inter_lengths, production_lengths
+):
+    """Every combination of the given inputs as a scenarios dataframe"""
+    return pd.MultiIndex.from_product(
+        [formations, geo_risk_indexes, surface_lengths, inter_lengths, production_lengths],
+        names=SCENARIO_COLUMNS,
+    ).to_frame(index=False)
+
+
+def score_scenarios(scenarios, batch_size=SERVING_BATCH_SIZE):
+    """
+    Estimate total cost and days on location for many scenarios at once.
+
+    scenarios has one row per scenario with the SCENARIO_COLUMNS. All cost and
+    job time model rows are built in one vectorized pass and sent in requests of
+    at most batch_size rows, so N scenarios cost about 22 * N / batch_size calls;
+    scenarios already in the prediction cache are not sent at all.
+    Returns the scenarios with SCENARIO_ID, TOTAL_COST and DAYS_ON_LOCATION added.
+    """
+    scenarios = scenarios[SCENARIO_COLUMNS].reset_index(drop=True)
+    scenarios.insert(0, "SCENARIO_ID", scenarios.index)
+
+    cost_rows = cost_feature_rows(scenarios)
+    cost_rows["PREDICTED_COST"] = [
+        value
+        for predictions in predict_scenarios(
+            COST_ENDPOINT, scenarios, cost_feature_rows, COST_FEATURES, batch_size
+        )
+        for value in predictions
+    ]
+    time_rows = time_feature_rows(scenarios)
+    time_rows["DOL_PREDICTIONS"] = [
+        value
+        for predictions in predict_scenarios(
+            TIME_ENDPOINT, scenarios, time_feature_rows, TIME_FEATURES, batch_size
+        )
+        for value in predictions
+    ]
+
+    totals = pd.DataFrame(
+        {
+            "TOTAL_COST": cost_rows.groupby("SCENARIO_ID")["PREDICTED_COST"].sum(),
+            "DAYS_ON_LOCATION": time_rows.groupby("SCENARIO_ID")["DOL_PREDICTIONS"].sum(),
+        }
+    )
+    return scenarios.join(totals, on="SCENARIO_ID")
+
+
 def drop_lakebase_table():
     """Function to drop the table in the lakebase database"""
-    conn = get_lakebase_connection()
-
-    with conn.cursor() as cursor:
+    global _schema_verified
+    with lakebase_connection() as conn, conn.cursor() as cursor:
         cursor.execute("DROP TABLE IF EXISTS estimations;")
+        # Forget the applied versions so the next bootstrap recreates the table
+        cursor.execute("DROP TABLE IF EXISTS schema_migrations;")
         conn.commit()
+    _schema_verified = False
 
 
-def create_lakebase_table():
-    """Function to create a table in the lakebase database"""
-    conn = get_lakebase_connection()
-
-    with conn.cursor() as cursor:
-        cursor.execute(
+# Versioned schema changes for the estimations database, applied in order by
+# migrate_lakebase_schema. Append new versions; never edit one that has shipped.
+SCHEMA_MIGRATIONS = [
+    (
+        1,
+        "create estimations",
+        [
             """
             CREATE TABLE IF NOT EXISTS estimations (
                 ID SERIAL PRIMARY KEY,
@@ -402,20 +1142,166 @@ def create_lakebase_table():
                 TOTAL_COST_ESTIMATION DECIMAL(10,2),
                 TOTAL_DAYS_ON_LOCATION DECIMAL(10,2)
             )
+            """,
+        ],
+    ),
+    (
+        2,
+        "estimations lookup and JSONB indexes",
+        [
+            "CREATE INDEX IF NOT EXISTS estimations_api_number_idx ON estimations (api_number)",
+            "CREATE INDEX IF NOT EXISTS estimations_formation_created_at_idx "
+            "ON estimations (formation, created_at)",
+            "CREATE INDEX IF NOT EXISTS estimations_created_by_idx ON estimations (created_by)",
+            # jsonb_path_ops indexes serve @> containment lookups on whole key/value paths
+            "CREATE INDEX IF NOT EXISTS estimations_cost_estimation_gin "
+            "ON estimations USING GIN (cost_estimation jsonb_path_ops)",
+            "CREATE INDEX IF NOT EXISTS estimations_days_on_location_gin "
+            "ON estimations USING GIN (days_on_location jsonb_path_ops)",
+        ],
+    ),
+    (
+        3,
+        "create prediction_cache",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS prediction_cache (
+                ENDPOINT VARCHAR(100),
+                MODEL_VERSION VARCHAR(200),
+                FORMATION VARCHAR(50),
+                GEO_RISK_INDEX DECIMAL(5,2),
+                SURFACE_LENGTH INT,
+                INTER_LENGTH INT,
+                PRODUCTION_LENGTH INT,
+                PREDICTIONS JSONB,
+                CREATED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (ENDPOINT, MODEL_VERSION, FORMATION, GEO_RISK_INDEX,
+                             SURFACE_LENGTH, INTER_LENGTH, PRODUCTION_LENGTH)
+            )
+            """,
+        ],
+    ),
+    (
+        4,
+        "estimations keyset pagination indexes",
+        [
+            # One index per ESTIMATION_PAGE_ORDERS order, alone and after the formation filter
+            "CREATE INDEX IF NOT EXISTS estimations_created_at_id_idx ON estimations (created_at, id)",
+            "CREATE INDEX IF NOT EXISTS estimations_formation_id_idx ON estimations (formation, id)",
+            "CREATE INDEX IF NOT EXISTS estimations_formation_created_at_id_idx "
+            "ON estimations (formation, created_at, id)",
+            # A prefix of estimations_formation_created_at_id_idx
+            "DROP INDEX IF EXISTS estimations_formation_created_at_idx",
+        ],
+    ),
+    (
+        5,
+        "drop unused JSONB indexes",
+        [
+            # Every estimation holds every cost line and job phase, so no query filters
+            # on JSONB containment; the GIN indexes only slowed down saves
+            "DROP INDEX IF EXISTS estimations_cost_estimation_gin",
+            "DROP INDEX IF EXISTS estimations_days_on_location_gin",
+        ],
+    ),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+# Arbitrary application-wide key so replicas starting together migrate one at a time
+SCHEMA_MIGRATION_LOCK = 72_410_020
+
+
+def migrate_lakebase_schema() -> int:
+    """
+    Bring the estimations schema up to SCHEMA_VERSION.
+
+    Applied versions are recorded in the schema_migrations table, and every
+    pending version runs in one transaction under an advisory lock, so a
+    failure leaves the schema at its previous version. Returns the version the
+    database is at afterwards.
+    """
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_MIGRATION_LOCK,))
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                VERSION INT PRIMARY KEY,
+                DESCRIPTION TEXT,
+                APPLIED_AT TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
         """
         )
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        current = cursor.fetchone()[0]
+        try:
+            for version, description, statements in SCHEMA_MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+                logger.info("Applied schema migration %s: %s", version, description)
+                current = version
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return current
+
+
+def get_schema_version() -> int:
+    """Schema version recorded in the database; 0 when it was never migrated"""
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        version = 0
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            version = cursor.fetchone()[0]
         conn.commit()
+    return version
 
 
-def get_lakebase_data(query):
-    """Function to get data from the lakebase database"""
-    conn = get_lakebase_connection()
+_schema_lock = threading.Lock()
+_schema_verified = False
+
+
+def ensure_lakebase_schema() -> bool:
+    """
+    Verify the schema once per process, migrating only when it is behind.
+
+    The first caller reads the recorded version (a plain SELECT, no DDL) and runs
+    migrate_lakebase_schema only if it is older than SCHEMA_VERSION; later
+    callers return on the cached flag without touching the database. The
+    index on the synced job data table lives outside the migrated schema and
+    is checked at the same time (see ensure_job_data_index). Returns True if
+    this call did the verification.
+    """
+    global _schema_verified
+    if _schema_verified:
+        return False
+    with _schema_lock:
+        if _schema_verified:
+            return False
+        if get_schema_version() < SCHEMA_VERSION:
+            migrate_lakebase_schema()
+        ensure_job_data_index()
+        _schema_verified = True
+        return True
 
-    with conn.cursor() as cursor:
-        cursor.execute(query)
-        columns = [desc[0].upper() for desc in cursor.description]
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows, columns=columns)
+
+def create_lakebase_table():
+    """Function to create the estimations table and its indexes in the lakebase database"""
+    return migrate_lakebase_schema()
+
+
+def get_lakebase_data(query, params=None):
+    """Function to get data from the lakebase database"""
+    # Arbitrary queries may be large, so they are streamed
+    return lakebase_query(query, params, stream=True)
 
 
 def save_estimations(
@@ -432,9 +1318,7 @@ def save_estimations(
     days_on_location,
 ):
     """Function to save the estimations to the lakebase database"""
-    conn = get_lakebase_connection()
-
-    with conn.cursor() as cursor:
+    with lakebase_connection() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             INSERT INTO estimations (api_number, formation, surface_length, inter_length, production_length, geo_risk_index, created_by, total_cost_estimation, total_days_on_location, cost_estimation, days_on_location)
@@ -463,9 +1347,7 @@ def save_estimations(
 
 def update_stamp_ai(estimation_id, summary, user_name):
     """Function to save the summary of the estimations to the lakebase database"""
-    conn = get_lakebase_connection()
-
-    with conn.cursor() as cursor:
+    with lakebase_connection() as conn, conn.cursor() as cursor:
         cursor.execute(
             """
             UPDATE estimations
@@ -477,78 +1359,468 @@ def update_stamp_ai(estimation_id, summary, user_name):
         conn.commit()
 
 
-def update_estimations() -> int:
-    """Function to update the estimations in the lakebase database"""
+# Columns of the estimations table that may be written from the data editor
+ESTIMATION_COLUMNS = {
+    "api_number",
+    "formation",
+    "surface_length",
+    "inter_length",
+    "production_length",
+    "geo_risk_index",
+    "created_at",
+    "updated_at",
+    "created_by",
+    "updated_by",
+    "review_stamp",
+    "cost_estimation",
+    "days_on_location",
+    "total_cost_estimation",
+    "total_days_on_location",
+}
+
+
+def _column_identifiers(columns):
+    """psycopg2 identifiers for editor column names, rejecting anything not in the table"""
+    from psycopg2 import sql as pg_sql
+
+    names = [column.lower() for column in columns]
+    unknown = set(names) - ESTIMATION_COLUMNS
+    if unknown:
+        raise ValueError(f"Unknown estimation columns: {', '.join(sorted(unknown))}")
+    return [pg_sql.Identifier(name) for name in names]
+
+
+def _group_by_columns(rows):
+    """Group (key, {column: value}) pairs by their set of columns"""
+    groups = {}
+    for key, values in rows:
+        columns = tuple(sorted(values))
+        groups.setdefault(columns, []).append((key, [values[column] for column in columns]))
+    return groups
+
+
+def update_estimations() -> dict:
+    """
+    Function to update the estimations in the lakebase database.
+
+    All edits from the data editor are written in one transaction with a few
+    set-based statements: edited rows are loaded into a temporary table and
+    applied with one UPDATE ... FROM per set of edited columns, added rows are
+    inserted with execute_values and deleted rows removed with a single
+    DELETE ... WHERE id = ANY(...). Returns the rows updated, inserted and
+    deleted, their total and the elapsed seconds.
+    """
+    from psycopg2 import sql as pg_sql
+    from psycopg2.extras import execute_values
 
+    started = time.perf_counter()
+    editor_state = st.session_state.get("estimations_df", {})
     # the edited rows format is dictionary containing only changed properties, not all; For instance, {0: {'API_NUMBER': '1223'}}
-    edited_rows = pd.DataFrame.from_dict(
-        st.session_state.get("estimations_df", {}).get("edited_rows", {}),
-        orient="index",
+    edited_rows = editor_state.get("edited_rows", {})
+    added_rows = editor_state.get("added_rows", [])
+    deleted_rows = editor_state.get("deleted_rows", [])
+
+    state = st.session_state.get("estimations_df_state", {})
+    result = {"updated": 0, "inserted": 0, "deleted": 0}
+
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        try:
+            # Update existing rows, one statement per set of edited columns
+            updates = _group_by_columns(
+                (int(state.loc[int(index), "ID"]), {k: v for k, v in values.items() if k.lower() != "id"})
+                for index, values in edited_rows.items()
+            )
+            if updates:
+                cursor.execute(
+                    "CREATE TEMP TABLE estimation_edits (LIKE estimations) ON COMMIT DROP"
+                )
+                user_name = get_user().user_name
+            for columns, rows in updates.items():
+                if not columns:
+                    continue
+                identifiers = _column_identifiers(columns)
+                cursor.execute("TRUNCATE estimation_edits")
+                execute_values(
+                    cursor,
+                    pg_sql.SQL("INSERT INTO estimation_edits (id, {columns}) VALUES %s")
+                    .format(columns=pg_sql.SQL(", ").join(identifiers))
+                    .as_string(cursor),
+                    [(id_, *values) for id_, values in rows],
+                    page_size=1000,
+                )
+                cursor.execute(
+                    pg_sql.SQL(
+                        """
+                        UPDATE estimations AS e
+                        SET {assignments}, updated_by = %s, updated_at = CURRENT_TIMESTAMP
+                        FROM estimation_edits AS t
+                        WHERE e.id = t.id
+                    """
+                    ).format(
+                        assignments=pg_sql.SQL(", ").join(
+                            pg_sql.SQL("{column} = t.{column}").format(column=identifier)
+                            for identifier in identifiers
+                        )
+                    ),
+                    (user_name,),
+                )
+                result["updated"] += cursor.rowcount
+
+            # Insert new rows, one statement per set of filled-in columns
+            inserts = _group_by_columns(
+                (index, {k: v for k, v in values.items() if k.lower() != "id"})
+                for index, values in enumerate(added_rows)
+            )
+            for columns, rows in inserts.items():
+                if not columns:
+                    continue
+                execute_values(
+                    cursor,
+                    pg_sql.SQL("INSERT INTO estimations ({columns}) VALUES %s")
+                    .format(columns=pg_sql.SQL(", ").join(_column_identifiers(columns)))
+                    .as_string(cursor),
+                    [values for _, values in rows],
+                    page_size=1000,
+                )
+                result["inserted"] += len(rows)
+
+            # Delete rows
+            if deleted_rows:
+                cursor.execute(
+                    "DELETE FROM estimations WHERE id = ANY(%s)",
+                    ([int(state.loc[int(index), "ID"]) for index in deleted_rows],),
+                )
+                result["deleted"] = cursor.rowcount
+
+            # Commit the changes
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    result["rows_affected"] = result["updated"] + result["inserted"] + result["deleted"]
+    result["elapsed_seconds"] = time.perf_counter() - started
+    return result
+
+
+#################### BULK IMPORT / EXPORT
+# Column order and Arrow types of an estimations export; JSONB columns are written as JSON text
+ESTIMATION_EXPORT_COLUMNS = [
+    ("id", "int64"),
+    ("api_number", "string"),
+    ("formation", "string"),
+    ("surface_length", "int32"),
+    ("inter_length", "int32"),
+    ("production_length", "int32"),
+    ("geo_risk_index", "decimal(5,2)"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+    ("created_by", "string"),
+    ("updated_by", "string"),
+    ("review_stamp", "string"),
+    ("cost_estimation", "string"),
+    ("days_on_location", "string"),
+    ("total_cost_estimation", "decimal(10,2)"),
+    ("total_days_on_location", "decimal(10,2)"),
+]
+JSONB_COLUMNS = {"cost_estimation", "days_on_location"}
+# pandas reads integer columns with blank cells as float64, which COPY rejects ("500.0")
+INTEGER_COLUMNS = {name for name, type_name in ESTIMATION_EXPORT_COLUMNS if type_name.startswith("int")}
+
+
+def _estimations_arrow_schema():
+    import pyarrow as pa
+
+    types = {
+        "int64": pa.int64(),
+        "int32": pa.int32(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        "decimal(5,2)": pa.decimal128(5, 2),
+        "decimal(10,2)": pa.decimal128(10, 2),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in ESTIMATION_EXPORT_COLUMNS])
+
+
+def _iter_import_chunks(source, file_format, chunk_size):
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif file_format == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_size)
+    else:
+        raise ValueError(f"Unsupported estimations file format: {file_format}")
+
+
+def _copy_statement(cursor, columns):
+    from psycopg2 import sql as pg_sql
+
+    return (
+        pg_sql.SQL("COPY estimations ({columns}) FROM STDIN WITH (FORMAT csv)")
+        .format(columns=pg_sql.SQL(", ").join(_column_identifiers(columns)))
+        .as_string(cursor)
     )
-    added_rows = pd.DataFrame(
-        st.session_state.get("estimations_df", {}).get("added_rows", [])
+
+
+def _copy_csv_file(cursor, source):
+    """
+    COPY a CSV file straight to the estimations table, without parsing it in pandas.
+
+    The header is validated against the table columns and the rest of the stream
+    goes to COPY as is. Returns the rows loaded, or None (with the file rewound)
+    when the file has an ID column, which COPY cannot skip.
+    """
+    file = open(source, newline="") if isinstance(source, str) else source
+    try:
+        header = file.readline()
+        if isinstance(header, bytes):
+            header = header.decode("utf-8-sig")
+        columns = [name.strip().lower() for name in next(csv.reader([header.lstrip("\ufeff")]))]
+        if "id" in columns:
+            if not isinstance(source, str):
+                file.seek(0)
+            return None
+        cursor.copy_expert(_copy_statement(cursor, columns), file)
+        return cursor.rowcount
+    finally:
+        if isinstance(source, str):
+            file.close()
+
+
+def import_estimations(source, file_format=None, chunk_size=50_000) -> dict:
+    """
+    Bulk load estimations from a CSV or Parquet file (path or file object) with COPY FROM STDIN.
+
+    A CSV file without an ID column is streamed to COPY directly. Otherwise the file
+    is read and copied chunk_size rows at a time, so memory stays bounded, and an ID
+    column is dropped so new rows get fresh ids. Everything is loaded in one
+    transaction. Returns the number of rows loaded and the elapsed seconds.
+    """
+    started = time.perf_counter()
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        file_format = "parquet" if str(name).lower().endswith(".parquet") else "csv"
+
+    rows = 0
+    with lakebase_connection() as conn, conn.cursor() as cursor:
+        try:
+            copied = _copy_csv_file(cursor, source) if file_format == "csv" else None
+            if copied is not None:
+                conn.commit()
+                return {"rows": copied, "elapsed_seconds": time.perf_counter() - started}
+
+            for chunk in _iter_import_chunks(source, file_format, chunk_size):
+                chunk = chunk.rename(columns=str.lower).drop(columns="id", errors="ignore")
+                for column in JSONB_COLUMNS.intersection(chunk.columns):
+                    chunk[column] = chunk[column].map(
+                        lambda value: json.dumps(value) if isinstance(value, (dict, list)) else value
+                    )
+                for column in INTEGER_COLUMNS.intersection(chunk.columns):
+                    chunk[column] = chunk[column].astype("Int64")
+                buffer = io.StringIO()
+                chunk.to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(_copy_statement(cursor, chunk.columns), buffer)
+                rows += len(chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {"rows": rows, "elapsed_seconds": time.perf_counter() - started}
+
+
+def export_estimations(
+    destination,
+    formation=None,
+    created_from=None,
+    created_to=None,
+    created_by=None,
+    chunk_size=50_000,
+) -> int:
+    """
+    Stream the estimations table (optionally filtered by formation, creation date window
+    and creator) into a Parquet file. Rows are read through a server-side cursor and
+    written chunk_size rows at a time, one row group per chunk. Returns the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    conditions = []
+    params = {}
+    for name, condition, value in [
+        ("formation", "formation = %(formation)s", formation),
+        ("created_from", "created_at >= %(created_from)s", created_from),
+        ("created_to", "created_at < %(created_to)s", created_to),
+        ("created_by", "created_by = %(created_by)s", created_by),
+    ]:
+        if value is not None:
+            conditions.append(condition)
+            params[name] = value
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = [name for name, _ in ESTIMATION_EXPORT_COLUMNS]
+    schema = _estimations_arrow_schema()
+
+    rows = 0
+    query = f"SELECT {', '.join(columns)} FROM estimations {where} ORDER BY id"
+    with pq.ParquetWriter(destination, schema) as writer:
+        for chunk in iter_lakebase_batches(query, params, batch_size=chunk_size):
+            chunk = chunk.rename(columns=str.lower)
+            for column in JSONB_COLUMNS:
+                chunk[column] = chunk[column].map(
+                    lambda value: None if value is None else json.dumps(value)
+                )
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+# Keyset orderings for paging through estimations; id breaks ties
+ESTIMATION_PAGE_ORDERS = {
+    "ID": ["id"],
+    "CREATED_AT": ["created_at", "id"],
+}
+
+
+def get_estimations_page(
+    after=None, limit=100, order_by="ID", descending=False, formation=None, created_by=None
+):
+    """
+    One page of estimations using keyset pagination.
+
+    Pages are ordered by ID or by (CREATED_AT, ID). after is the keyset cursor
+    returned with the previous page (None for the first page). Unfiltered or
+    filtered by formation, each page is a range scan of the primary key or a
+    schema version 4 index however deep the user pages; filtered by creator,
+    the creator's rows are found by index and sorted. Returns (page, next
+    cursor); the next cursor is None on the last page.
+    """
+    order_columns = ESTIMATION_PAGE_ORDERS[order_by.upper()]
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+
+    conditions = []
+    params = {"limit": limit}
+    if after is not None:
+        markers = []
+        for column, value in zip(order_columns, after):
+            params[f"after_{column}"] = value
+            markers.append(f"%(after_{column})s")
+        conditions.append(f"({', '.join(order_columns)}) {comparison} ({', '.join(markers)})")
+    if formation is not None:
+        conditions.append("formation = %(formation)s")
+        params["formation"] = formation
+    if created_by is not None:
+        conditions.append("created_by = %(created_by)s")
+        params["created_by"] = created_by
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ", ".join(f"{column} {direction}" for column in order_columns)
+
+    page = lakebase_query(
+        f"SELECT * FROM estimations {where} ORDER BY {order} LIMIT %(limit)s", params
     )
-    deleted_rows = pd.DataFrame(
-        st.session_state.get("estimations_df", {}).get("deleted_rows", [])
+    if len(page) < limit:
+        return page, None
+    # tolist() turns numpy scalars into Python values psycopg2 can bind
+    return page, tuple(page[column.upper()].tolist()[-1] for column in order_columns)
+
+
+#################### JSONB QUERIES
+# Display strings such as "$1,234.00" and "1,234.56" as numeric, computed in Postgres
+_COST_VALUE = "replace(replace(e.cost_estimation -> 'PREDICTED_COST' ->> d.key, '$', ''), ',', '')::numeric"
+_DAYS_VALUE = "replace(e.days_on_location -> 'DOL_PREDICTIONS' ->> d.key, ',', '')::numeric"
+
+
+def get_cost_lines(estimation_id) -> pd.DataFrame:
+    """
+    Cost lines of one estimation, unpacked from its COST_ESTIMATION JSONB.
+
+    The blob is stored in DataFrame.to_json()'s column orientation, so the
+    COST_DESC and PREDICTED_COST objects are joined on their row keys.
+    """
+    return lakebase_query(
+        f"""
+        SELECT d.key::int AS line, d.value AS cost_desc, {_COST_VALUE} AS predicted_cost
+        FROM estimations e
+        CROSS JOIN LATERAL jsonb_each_text(e.cost_estimation -> 'COST_DESC') d
+        WHERE e.id = %(id)s
+        ORDER BY line
+    """,
+        {"id": estimation_id},
     )
 
-    state = st.session_state.get("estimations_df_state", {})
 
-    conn = get_lakebase_connection()
+def get_phase_days(estimation_id) -> pd.DataFrame:
+    """Days on location per job phase of one estimation, unpacked from its DAYS_ON_LOCATION JSONB"""
+    return lakebase_query(
+        f"""
+        SELECT d.key::int AS line,
+               d.value AS job_phase,
+               e.days_on_location -> 'JOB_SUB_PHASE' ->> d.key AS job_sub_phase,
+               {_DAYS_VALUE} AS dol_predictions
+        FROM estimations e
+        CROSS JOIN LATERAL jsonb_each_text(e.days_on_location -> 'JOB_PHASE') d
+        WHERE e.id = %(id)s
+        ORDER BY line
+    """,
+        {"id": estimation_id},
+    )
 
-    with conn.cursor() as cursor:
-        # Update existing rows
-        for index, row in edited_rows.iterrows():
-            # the edited rows format is dictionary containing only changed properties, not all; For instance, {0: {'API_NUMBER': '1223'}}
-            update_values = ", ".join(
-                [f"{col} = %s" for col in row.index if col != "id"]
-            )
-            update_params = [row[col] for col in row.index if col != "id"]
-            id_ = int(state.loc[index, "ID"])
-
-            cursor.execute(
-                f"""
-                UPDATE estimations
-                SET {update_values}, updated_by = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """,
-                (*update_params, get_user().user_name, id_),
-            )
 
-        # Insert new rows
-        for index, row in added_rows.iterrows():
-            insert_values = ", ".join(["%s"] * len(row))
-            insert_params = [row[col] for col in row.index]
-            cursor.execute(
-                f"""
-                INSERT INTO estimations ({', '.join(row.index)})
-                VALUES ({insert_values})
-            """,
-                insert_params,
-            )
+def get_cost_line_history(cost_desc, formation=None, created_from=None, limit=1000) -> pd.DataFrame:
+    """
+    One cost line across saved estimations, newest first.
 
-        # Delete rows
-        for index, row in deleted_rows.iterrows():
-            id_ = int(state.loc[index, "ID"])
-            cursor.execute(
-                """
-                DELETE FROM estimations
-                WHERE id = %s
-            """,
-                (id_,),
-            )
+    Every estimation holds all cost lines, so a JSONB containment predicate
+    would not narrow the scan (and there is no GIN index for one); the
+    formation and created_from filters use the (formation, created_at, id)
+    index instead.
+    """
+    conditions = ["d.value = %(cost_desc)s"]
+    params = {"cost_desc": cost_desc, "limit": limit}
+    if formation is not None:
+        conditions.append("e.formation = %(formation)s")
+        params["formation"] = formation
+    if created_from is not None:
+        conditions.append("e.created_at >= %(created_from)s")
+        params["created_from"] = created_from
+    return lakebase_query(
+        f"""
+        SELECT e.id, e.api_number, e.formation, e.created_at, {_COST_VALUE} AS predicted_cost
+        FROM estimations e
+        CROSS JOIN LATERAL jsonb_each_text(e.cost_estimation -> 'COST_DESC') d
+        WHERE {' AND '.join(conditions)}
+        ORDER BY e.created_at DESC
+        LIMIT %(limit)s
+    """,
+        params,
+    )
 
-        # Commit the changes
-        conn.commit()
 
-    return len(edited_rows) + len(added_rows) + len(deleted_rows)
+def get_cost_line_summary(formation=None) -> pd.DataFrame:
+    """Count, mean, min and max predicted cost per cost line, aggregated in Postgres"""
+    where = "WHERE e.formation = %(formation)s" if formation is not None else ""
+    return lakebase_query(
+        f"""
+        SELECT d.value AS cost_desc,
+               COUNT(*) AS estimations,
+               AVG({_COST_VALUE}) AS mean_cost,
+               MIN({_COST_VALUE}) AS min_cost,
+               MAX({_COST_VALUE}) AS max_cost
+        FROM estimations e
+        CROSS JOIN LATERAL jsonb_each_text(e.cost_estimation -> 'COST_DESC') d
+        {where}
+        GROUP BY d.value
+        ORDER BY d.value
+    """,
+        {"formation": formation},
+    )
 
 
 def get_api_numbers():
     """Function to get the API numbers from the lakebase database"""
-    conn = get_lakebase_connection()
-
-    with conn.cursor() as cursor:
+    with lakebase_connection() as conn, conn.cursor() as cursor:
         cursor.execute("SELECT DISTINCT api_number FROM estimations;")
         rows = cursor.fetchall()
         return [row[0] for row in rows]
@@ -0,0 +1,404 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("METRICS_SERVICE_NAME", "chat-genie-app")
+
+# Durations kept per operation for percentiles, and finished spans kept for tracing
+METRICS_MAX_SAMPLES = int(os.getenv("METRICS_MAX_SAMPLES", 2000))
+METRICS_MAX_SPANS = int(os.getenv("METRICS_MAX_SPANS", 1000))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation against an external system.
+
+    rows, bytes and retries are filled in by the instrumented code where it can
+    measure them and stay None otherwise, so an unmeasured value is never
+    reported as 0; attributes hold the inputs (statement, endpoint, ids) used to
+    find the operation again when it shows up as slow."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any], parent: Optional["Span"] = None):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.retries: Optional[int] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_rows(self, rows: int):
+        self.rows = (self.rows or 0) + rows
+
+    def add_bytes(self, size: int):
+        self.bytes = (self.bytes or 0) + size
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "attributes": dict(self.attributes),
+        }
+
+
+class _Operation:
+    """Running totals and recent durations of one operation name"""
+
+    def __init__(self, max_samples: int):
+        self.durations = deque(maxlen=max_samples)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        # None until a span of the operation measures them
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.retries: Optional[int] = None
+
+
+class MetricsRegistry:
+    """Thread-safe, in-process store of spans, operation latencies and gauges.
+
+    Every finished span updates its operation's counters and recent durations
+    (for p50/p95/p99) and is kept in a bounded buffer for trace export and the
+    slowest-operations view. Gauges are callbacks returning a dict of numbers
+    (cache and pool stats), read at export time."""
+
+    def __init__(self, max_samples: int = METRICS_MAX_SAMPLES, max_spans: int = METRICS_MAX_SPANS):
+        self.max_samples = max_samples
+        self._operations: Dict[str, _Operation] = {}
+        self._spans = deque(maxlen=max_spans)
+        self._gauges: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Time the block as one operation; nested spans join the same trace"""
+        span = Span(name, attributes, parent=_current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # A generator holding the span was closed early; not a failure
+            span.finish()
+            raise
+        except BaseException as e:
+            span.finish(e)
+            raise
+        else:
+            span.finish()
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        status: str = "ok",
+        rows: Optional[int] = None,
+        size: Optional[int] = None,
+        retries: Optional[int] = None,
+        **attributes,
+    ):
+        """Record an operation timed elsewhere"""
+        span = Span(name, attributes, parent=_current_span.get())
+        span.start_time -= seconds
+        span.duration = seconds
+        span.status = status
+        span.rows = rows
+        span.bytes = size
+        span.retries = retries
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            operation = self._operations.get(span.name)
+            if operation is None:
+                operation = self._operations[span.name] = _Operation(self.max_samples)
+            operation.durations.append(span.duration)
+            operation.count += 1
+            operation.errors += span.status != "ok"
+            operation.total_seconds += span.duration
+            if span.rows is not None:
+                operation.rows = (operation.rows or 0) + span.rows
+            if span.bytes is not None:
+                operation.bytes = (operation.bytes or 0) + span.bytes
+            if span.retries is not None:
+                operation.retries = (operation.retries or 0) + span.retries
+            self._spans.append(span)
+        logger.debug("%s took %.3fs (%s)", span.name, span.duration, span.status)
+
+    def register_gauge(self, name: str, callback: Callable[[], Dict[str, Any]]):
+        with self._lock:
+            self._gauges[name] = callback
+
+    def gauges(self) -> Dict[str, Dict[str, float]]:
+        """Current numeric values of every registered gauge"""
+        with self._lock:
+            callbacks = dict(self._gauges)
+        values = {}
+        for name, callback in callbacks.items():
+            try:
+                stats = callback()
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {str(e)}")
+                continue
+            values[name] = {
+                key: float(value)
+                for key, value in stats.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+        return values
+
+    def operations(self) -> List[str]:
+        with self._lock:
+            return sorted(self._operations)
+
+    def samples(self, name: str) -> List[float]:
+        """Recent durations (seconds) of one operation, oldest first"""
+        with self._lock:
+            operation = self._operations.get(name)
+            return list(operation.durations) if operation is not None else []
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, errors, mean, p50, p95, p99 and max latency (seconds) plus payload totals per operation.
+        rows, bytes and retries are None for operations that do not measure them."""
+        with self._lock:
+            snapshot = {
+                name: (sorted(op.durations), op.count, op.errors, op.total_seconds, op.rows, op.bytes, op.retries)
+                for name, op in self._operations.items()
+            }
+        summary = {}
+        for name, (durations, count, errors, total, rows, size, retries) in snapshot.items():
+            stats = {"count": count, "errors": errors, "sum": total, "rows": rows, "bytes": size, "retries": retries}
+            if durations:
+                stats["mean"] = sum(durations) / len(durations)
+                stats["max"] = durations[-1]
+                for quantile in QUANTILES:
+                    stats[f"p{int(quantile * 100)}"] = durations[int(quantile * (len(durations) - 1))]
+            summary[name] = stats
+        return summary
+
+    def recent_spans(self, name_prefix: str = "") -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = list(self._spans)
+        return [span.as_dict() for span in spans if span.name.startswith(name_prefix)]
+
+    def slowest(self, limit: int = 20, name_prefix: str = "") -> List[Dict[str, Any]]:
+        """Slowest recent spans with their attributes, slowest first"""
+        spans = self.recent_spans(name_prefix)
+        return sorted(spans, key=lambda span: span["duration"], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._spans.clear()
+
+    def to_otlp_json(self) -> Dict[str, Any]:
+        """Recent spans in the OTLP/JSON trace format (ExportTraceServiceRequest)"""
+        spans = []
+        for span in self.recent_spans():
+            attributes = {
+                **span["attributes"],
+                "rows": span["rows"],
+                "bytes": span["bytes"],
+                "retries": span["retries"],
+            }
+            start = int(span["start_time"] * 1e9)
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 3,  # SPAN_KIND_CLIENT: every span is a call to an external system
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + int(span["duration"] * 1e9)),
+                "attributes": [_otlp_attribute(key, value) for key, value in attributes.items() if value is not None],
+                "status": {"code": 1} if span["status"] == "ok" else {"code": 2, "message": span["error"] or ""},
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+
+    def to_prometheus(self) -> str:
+        """Operation latencies, payload counters and gauges in the Prometheus text format"""
+        lines = [
+            "# HELP app_operation_duration_seconds Latency of calls to external systems",
+            "# TYPE app_operation_duration_seconds summary",
+        ]
+        summary = self.summary()
+        for name, stats in summary.items():
+            for quantile in QUANTILES:
+                key = f"p{int(quantile * 100)}"
+                if key in stats:
+                    lines.append(
+                        f'app_operation_duration_seconds{{operation="{_label(name)}",quantile="{quantile}"}} {stats[key]}'
+                    )
+            lines.append(f'app_operation_duration_seconds_sum{{operation="{_label(name)}"}} {stats["sum"]}')
+            lines.append(f'app_operation_duration_seconds_count{{operation="{_label(name)}"}} {stats["count"]}')
+        for field, help_text in (
+            ("errors", "Failed calls"),
+            ("rows", "Rows sent or received"),
+            ("bytes", "Payload bytes sent or received"),
+            ("retries", "Retried calls"),
+        ):
+            lines.append(f"# HELP app_operation_{field}_total {help_text}")
+            lines.append(f"# TYPE app_operation_{field}_total counter")
+            for name, stats in summary.items():
+                if stats[field] is not None:
+                    lines.append(f'app_operation_{field}_total{{operation="{_label(name)}"}} {stats[field]}')
+        lines.append("# HELP app_gauge Cache and connection pool statistics")
+        lines.append("# TYPE app_gauge gauge")
+        for name, stats in self.gauges().items():
+            for stat, value in stats.items():
+                lines.append(f'app_gauge{{source="{_label(name)}",stat="{_label(stat)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, target: str, fmt: str = "prometheus"):
+        """
+        Write the metrics to a local file or POST them to an http(s) endpoint.
+
+        fmt is "prometheus" (text exposition format) or "otlp" (OTLP/JSON traces).
+        Files are replaced atomically so a scraper never reads a partial export.
+        """
+        if fmt == "otlp":
+            body, content_type = json.dumps(self.to_otlp_json()), "application/json"
+        elif fmt == "prometheus":
+            body, content_type = self.to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            raise ValueError(f"Unknown metrics format {fmt!r}; expected 'prometheus' or 'otlp'")
+
+        if target.startswith(("http://", "https://")):
+            import requests
+
+            response = requests.post(target, data=body.encode(), headers={"Content-Type": content_type}, timeout=10)
+            response.raise_for_status()
+            return
+        directory = os.path.dirname(os.path.abspath(target))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(body)
+        os.replace(temporary, target)
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+metrics = MetricsRegistry()
+
+
+def traced(name: str, **attributes):
+    """Decorator running each call of the function inside metrics.span(name)"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name, **attributes):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def describe_statement(statement: Any, limit: int = 200) -> str:
+    """Single-line, truncated text of a SQL statement for span attributes"""
+    if not isinstance(statement, str):
+        # psycopg2.sql.Composed and friends
+        statement = getattr(statement, "string", None) or repr(statement)
+    text = " ".join(statement.split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+_exporter_lock = threading.Lock()
+_exporter: Optional[threading.Thread] = None
+
+
+def start_exporter(target: Optional[str] = None, fmt: Optional[str] = None, interval: Optional[float] = None) -> bool:
+    """
+    Export the metrics every interval seconds on a daemon thread.
+
+    Defaults come from METRICS_EXPORT_TARGET (a file path or URL),
+    METRICS_EXPORT_FORMAT (prometheus or otlp) and METRICS_EXPORT_INTERVAL.
+    Does nothing without a target or when an exporter is already running;
+    returns whether one was started.
+    """
+    global _exporter
+    target = target or os.getenv("METRICS_EXPORT_TARGET")
+    fmt = fmt or os.getenv("METRICS_EXPORT_FORMAT", "prometheus")
+    interval = interval or float(os.getenv("METRICS_EXPORT_INTERVAL", 60))
+    if not target:
+        return False
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                metrics.export(target, fmt)
+            except Exception as e:
+                logger.warning(f"Metrics export to {target} failed: {str(e)}")
+
+    with _exporter_lock:
+        if _exporter is not None:
+            return False
+        _exporter = threading.Thread(target=run, name="metrics-export", daemon=True)
+        _exporter.start()
+    return True
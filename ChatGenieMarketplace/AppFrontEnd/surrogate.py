@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import data
+from metrics import metrics
+from utils import get_targeted_env
+
+logger = logging.getLogger(__name__)
+
+# Input ranges of the drill-planning sliders
+SURFACE_RANGE = (300, 800)
+INTER_RANGE = (5000, 9000)
+PRODUCTION_RANGE = (6000, 10000)
+GEO_RISK_BUCKETS = [round(0.1 * i, 1) for i in range(11)]
+
+# Surrogates are rebuilt after this long, or as soon as either endpoint serves a new model version
+SURROGATE_TTL = int(get_targeted_env("SURROGATE_TTL", data.PREDICTION_CACHE_TTL))
+
+# Job sub phase rows belonging to each casing section
+PHASE_ROWS = {
+    column: [i for i, depth_column in enumerate(data.job_phase_depth_columns) if depth_column == column]
+    for column in ["SURFACE_LENGTH", "INTER_LENGTH", "PRODUCTION_LENGTH"]
+}
+RIG_MOVE_ROWS = [i for i, depth_column in enumerate(data.job_phase_depth_columns) if depth_column is None]
+
+
+class SurrogateEstimator:
+    """Instant, provisional cost and days-on-location estimates for one formation.
+
+    Built from a grid of real endpoint predictions: each model row depends only
+    on its own depth, so total cost is interpolated over total depth and the days
+    of each casing section over that section's length, per geo risk bucket. The
+    endpoints remain authoritative; record_error tracks how far off this is."""
+
+    def __init__(self, formation, depth_grid, cost_grid, phase_grids, rig_move_days, model_versions=None):
+        self.formation = formation
+        self.model_versions = model_versions  # (cost, time) endpoint versions it was built from
+        self.depth_grid = depth_grid  # {"TOTAL_DEPTH": array, "SURFACE_LENGTH": array, ...}
+        self.cost_grid = cost_grid  # {geo bucket: total cost per total depth}
+        self.phase_grids = phase_grids  # {geo bucket: {length column: days per length}}
+        self.rig_move_days = rig_move_days  # {geo bucket: days}
+        self.built_at = time.time()
+
+    @classmethod
+    def build(cls, formation, grid_points=9, geo_risk_indexes=GEO_RISK_BUCKETS):
+        """Score grid_points scenarios per geo risk bucket (a few batched endpoint calls)"""
+        # Read before scoring, so a redeploy during the build leaves the surrogate stale
+        model_versions = model_versions_now()
+        lengths = {
+            "SURFACE_LENGTH": np.linspace(*SURFACE_RANGE, grid_points).round(),
+            "INTER_LENGTH": np.linspace(*INTER_RANGE, grid_points).round(),
+            "PRODUCTION_LENGTH": np.linspace(*PRODUCTION_RANGE, grid_points).round(),
+        }
+        # All three lengths move together along the grid; every model row sees its own depth
+        scenarios = pd.DataFrame(
+            [
+                [formation, geo, *(lengths[column][k] for column in lengths)]
+                for geo in geo_risk_indexes
+                for k in range(grid_points)
+            ],
+            columns=data.SCENARIO_COLUMNS,
+        )
+        cost = data.predict_scenarios(
+            data.COST_ENDPOINT, scenarios, data.cost_feature_rows, data.COST_FEATURES
+        )
+        days = data.predict_scenarios(
+            data.TIME_ENDPOINT, scenarios, data.time_feature_rows, data.TIME_FEATURES
+        )
+
+        depth_grid = dict(lengths, TOTAL_DEPTH=sum(lengths.values()))
+        cost_grid, phase_grids, rig_move_days = {}, {}, {}
+        for g, geo in enumerate(geo_risk_indexes):
+            rows = range(g * grid_points, (g + 1) * grid_points)
+            cost_grid[geo] = np.array([sum(cost[k]) for k in rows])
+            phase_grids[geo] = {
+                column: np.array([sum(days[k][i] for i in phase_rows) for k in rows])
+                for column, phase_rows in PHASE_ROWS.items()
+            }
+            rig_move_days[geo] = float(
+                np.mean([sum(days[k][i] for i in RIG_MOVE_ROWS) for k in rows])
+            )
+        return cls(formation, depth_grid, cost_grid, phase_grids, rig_move_days, model_versions)
+
+    def is_current(self, model_versions):
+        """Whether this surrogate is younger than SURROGATE_TTL and built from model_versions"""
+        return time.time() - self.built_at < SURROGATE_TTL and self.model_versions == model_versions
+
+    def _bucket(self, geo_risk_index):
+        return min(self.cost_grid, key=lambda geo: abs(geo - geo_risk_index))
+
+    def estimate(self, geo_risk_index, surface_length, inter_length, production_length):
+        """Return (total cost, days on location) by interpolation"""
+        geo = self._bucket(geo_risk_index)
+        total_depth = surface_length + inter_length + production_length
+        cost = np.interp(total_depth, self.depth_grid["TOTAL_DEPTH"], self.cost_grid[geo])
+        lengths = {
+            "SURFACE_LENGTH": surface_length,
+            "INTER_LENGTH": inter_length,
+            "PRODUCTION_LENGTH": production_length,
+        }
+        dol = self.rig_move_days[geo] + sum(
+            np.interp(length, self.depth_grid[column], self.phase_grids[geo][column])
+            for column, length in lengths.items()
+        )
+        return float(cost), float(dol)
+
+
+def model_versions_now():
+    """Model versions currently served by the cost and time endpoints (cached by data)"""
+    return data.get_endpoint_version(data.COST_ENDPOINT), data.get_endpoint_version(data.TIME_ENDPOINT)
+
+
+_surrogates = {}
+_surrogates_lock = threading.Lock()
+# Held while a formation's surrogate is built, so concurrent sessions build it once
+_build_locks = {}
+_building = set()
+
+
+def _current_surrogate(formation):
+    with _surrogates_lock:
+        surrogate = _surrogates.get(formation)
+    if surrogate is not None and surrogate.is_current(model_versions_now()):
+        return surrogate
+    return None
+
+
+def get_surrogate(formation):
+    """The process-wide surrogate for a formation, built on first use and rebuilt
+    when it expires or an endpoint starts serving a different model version"""
+    surrogate = _current_surrogate(formation)
+    if surrogate is not None:
+        return surrogate
+    with _surrogates_lock:
+        build_lock = _build_locks.setdefault(formation, threading.Lock())
+    with build_lock:
+        # Another session may have built it while this one waited for the lock
+        surrogate = _current_surrogate(formation)
+        if surrogate is None:
+            surrogate = SurrogateEstimator.build(formation)
+            with _surrogates_lock:
+                _surrogates[formation] = surrogate
+    return surrogate
+
+
+def get_surrogate_nowait(formation):
+    """The current surrogate for a formation, or None while one is built in the
+    background (callers use the endpoints meanwhile)"""
+    surrogate = _current_surrogate(formation)
+    if surrogate is None:
+        with _surrogates_lock:
+            if formation in _building:
+                return None
+            _building.add(formation)
+        threading.Thread(
+            target=_build_in_background, args=(formation,), name=f"surrogate-{formation}", daemon=True
+        ).start()
+    return surrogate
+
+
+def _build_in_background(formation):
+    try:
+        get_surrogate(formation)
+    except Exception as e:
+        logger.warning(f"Building the surrogate for {formation} failed: {str(e)}")
+    finally:
+        with _surrogates_lock:
+            _building.discard(formation)
+
+
+def peek_surrogate(formation):
+    """The surrogate for a formation if one has been built, else None"""
+    with _surrogates_lock:
+        return _surrogates.get(formation)
+
+
+def surrogate_stats():
+    with _surrogates_lock:
+        return {"built": len(_surrogates), "building": len(_building)}
+
+
+# Relative errors of surrogate estimates against the authoritative endpoint results
+surrogate_errors = deque(maxlen=500)
+
+
+def record_error(formation, estimate, total_cost, dol):
+    cost, days = estimate
+    surrogate_errors.append(
+        {
+            "formation": formation,
+            "cost_error": abs(cost - total_cost) / abs(total_cost) if total_cost else None,
+            "dol_error": abs(days - dol) / abs(dol) if dol else None,
+            "recorded_at": time.time(),
+        }
+    )
+
+
+def error_stats():
+    """Mean and max relative error of recent surrogate estimates"""
+    errors = list(surrogate_errors)
+    stats = {"count": len(errors)}
+    for name in ["cost_error", "dol_error"]:
+        values = [error[name] for error in errors if error[name] is not None]
+        if values:
+            stats[f"mean_{name}"] = sum(values) / len(values)
+            stats[f"max_{name}"] = max(values)
+    return stats
+
+
+metrics.register_gauge("surrogates", surrogate_stats)
+metrics.register_gauge("surrogate_errors", error_stats)
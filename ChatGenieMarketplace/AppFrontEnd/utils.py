@@ -1,21 +1,81 @@
+import functools
+import hashlib
 import os
-from typing import Optional
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
 
 import streamlit as st
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.service.iam import User
 
+from cache import TTLCache
+from metrics import metrics
 
-def get_workspace_client() -> WorkspaceClient:
-    w = WorkspaceClient()
-    return w
 
+class ClientRegistry:
+    """Process-wide, thread-safe cache of API clients.
+
+    Clients are keyed by (host, auth identity, space_id) so every Streamlit
+    session reuses the same HTTP session and keep-alive connections instead of
+    paying TLS handshakes and auth resolution on each call."""
+
+    def __init__(self):
+        self._clients: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.clients_created = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            self.misses += 1
+
+        # Built outside the lock: a client may resolve auth over the network, which
+        # must not block lookups of other keys
+        client = factory()
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                # Another thread built one first; use it so every caller shares one client
+                return existing
+            self.clients_created += 1
+            self._clients[key] = client
+            return client
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "clients_created": self.clients_created,
+                "clients": len(self._clients),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
 
-def get_user() -> User:
-    w = get_workspace_client()
 
-    # Get the current user's details
-    return w.current_user.me()
+client_registry = ClientRegistry()
+metrics.register_gauge("client_registry", client_registry.stats)
+
+
+def auth_identity(token: Optional[str] = None) -> str:
+    """Return a stable, non-secret identifier for the credentials in use"""
+    secret = token or os.getenv("DATABRICKS_TOKEN")
+    if secret:
+        return "token:" + hashlib.sha256(secret.encode()).hexdigest()[:16]
+    return "client:" + os.getenv("DATABRICKS_CLIENT_ID", "default")
+
+
+def get_workspace_client() -> WorkspaceClient:
+    key = (os.getenv("DATABRICKS_HOST", ""), auth_identity(), None)
+    return client_registry.get_or_create(key, WorkspaceClient)
 
 
 def get_targeted_env(key: str, default=None) -> Optional[str]:
@@ -29,8 +89,89 @@ def get_targeted_env(key: str, default=None) -> Optional[str]:
     return result
 
 
+@dataclass(frozen=True)
+class Settings:
+    """Deployment settings, resolved once from the environment with get_targeted_env"""
+
+    databricks_host: str
+    warehouse_id: Optional[str]
+    lakebase_instance_name: Optional[str]
+    lakebase_host: Optional[str]
+    lakebase_port: int
+    lakebase_database: str
+    lakebase_sync_database: Optional[str]
+    lakebase_sync_schema: Optional[str]
+    lakebase_sync_job_data_table: Optional[str]
+    lakebase_pool_min_size: int
+    lakebase_pool_max_size: int
+    identity_cache_ttl: float
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            databricks_host=os.getenv("DATABRICKS_HOST", ""),
+            warehouse_id=get_targeted_env("DATABRICKS_WAREHOUSE_ID"),
+            lakebase_instance_name=get_targeted_env("LAKEBASE_INSTANCE_NAME"),
+            lakebase_host=get_targeted_env("LAKEBASE_HOST"),
+            lakebase_port=int(get_targeted_env("LAKEBASE_PORT", 5432)),
+            lakebase_database=get_targeted_env("LAKEBASE_DATABASE", "databricks_postgres"),
+            lakebase_sync_database=get_targeted_env("LAKEBASE_SYNC_DATABASE", "databricks_postgres"),
+            lakebase_sync_schema=get_targeted_env("LAKEBASE_SYNC_SCHEMA"),
+            lakebase_sync_job_data_table=get_targeted_env("LAKEBASE_SYNC_JOB_DATA_TABLE"),
+            lakebase_pool_min_size=int(get_targeted_env("LAKEBASE_POOL_MIN_SIZE", 1)),
+            lakebase_pool_max_size=int(get_targeted_env("LAKEBASE_POOL_MAX_SIZE", 10)),
+            identity_cache_ttl=float(get_targeted_env("IDENTITY_CACHE_TTL", 3600)),
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Process-wide settings; get_settings.cache_clear() re-reads the environment"""
+    return Settings.from_env()
+
+
+metrics.register_gauge("settings", lambda: get_settings.cache_info()._asdict())
+
+
+# Current-user lookups keyed by (host, auth identity), so each principal costs one
+# current_user.me() call per credential lifetime
+identity_cache = TTLCache(max_entries=1024)
+metrics.register_gauge("identity_cache", identity_cache.stats)
+_identity_lock = threading.Lock()
+
+
+def get_user() -> User:
+    key = (get_settings().databricks_host, auth_identity())
+    user = identity_cache.get(key)
+    if user is not None:
+        return user
+    with _identity_lock:
+        # Another thread may have resolved it while this one waited
+        user = identity_cache.pop(key)
+        if user is None:
+            # Get the current user's details
+            user = get_workspace_client().current_user.me()
+        identity_cache.set(key, user, ttl_seconds=get_settings().identity_cache_ttl)
+        return user
+
+
 def get_context_username() -> str:
+    """Username of the viewer, remembered for the rest of the Streamlit session"""
     try:
-        return st.context.headers.get("X-Forwarded-Preferred-Username")
+        cached = st.session_state.get("context_username")
+    except Exception:
+        # No session, e.g. on a worker thread
+        cached = None
+    if cached:
+        return cached
+
+    try:
+        username = st.context.headers.get("X-Forwarded-Preferred-Username")
     except KeyError:
-        return get_user().user_name
+        username = None
+    username = username or get_user().user_name
+    try:
+        st.session_state["context_username"] = username
+    except Exception:
+        pass
+    return username
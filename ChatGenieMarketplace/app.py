@@ -1,15 +1,16 @@
-import altair as alt
 import streamlit as st
 import pandas as pd
 import os
 import sys
 import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Import Genie functionality
 import sys
 sys.path.append(os.path.dirname(__file__))
-from genie_room import genie_query
+from genie_room import genie_chat, describe_status
 
 # Import data module and utils from AppFrontEnd
 try:
@@ -21,10 +22,12 @@ try:
     # Import modules - catch both ImportError and AssertionError
     try:
         import data
+        import surrogate
         from utils import get_context_username, get_targeted_env
     except (ImportError, AssertionError) as e:
         # If data module fails due to missing Lakebase config, set to None
         data = None
+        surrogate = None
         from utils import get_context_username, get_targeted_env
 except (ImportError, AssertionError) as e:
     st.warning(f"Could not import some AppFrontEnd modules: {e}. Some features may not work.")
@@ -34,6 +37,7 @@ except (ImportError, AssertionError) as e:
     def get_targeted_env(key, default=None):
         return os.environ.get(key, default)
     data = None
+    surrogate = None
 
 # Load environment variables
 load_dotenv()
@@ -152,28 +156,26 @@ st.markdown(hocol_style, unsafe_allow_html=True)
 
 st.title(f"**{title}**", anchor=False)
 # Load HOCOL logo
-try:
-    logo_path = os.path.join(os.path.dirname(__file__), "AppFrontEnd", "static", "images", "hocollogo.png")
-    if os.path.exists(logo_path):
-        with open(logo_path, "rb") as img_file:
-            img_data = base64.b64encode(img_file.read()).decode()
-            st.markdown(
-                f'<p style="text-align: right; padding: 8px 0px; margin: 0px;"><span style="color: #4a5568; font-size: 0.875rem; font-weight: 500; margin-right: 10px; vertical-align: middle;">Powered by</span><span style="background-color: #ffffff; padding: 6px 10px; border-radius: 4px; display: inline-block; vertical-align: middle;"><img src="data:image/png;base64,{img_data}" style="display: block; height: 40px; width: auto; max-width: 180px; object-fit: contain;"/></span></p>',
-                unsafe_allow_html=True,
-            )
-    else:
-        # Fallback: use direct path
-        st.markdown(
-            '<p style="text-align: right; padding: 8px 0px; margin: 0px;"><span style="color: #4a5568; font-size: 0.875rem; font-weight: 500; margin-right: 10px; vertical-align: middle;">Powered by</span><span style="background-color: #ffffff; padding: 6px 10px; border-radius: 4px; display: inline-block; vertical-align: middle;"><img src="AppFrontEnd/static/images/hocollogo.png" style="display: block; height: 40px; width: auto; max-width: 180px; object-fit: contain;"/></span></p>',
-            unsafe_allow_html=True,
-        )
-except Exception:
-    # Fallback: use direct path
-    st.markdown(
-        '<p style="text-align: right; padding: 8px 0px; margin: 0px;"><span style="color: #4a5568; font-size: 0.875rem; font-weight: 500; margin-right: 10px; vertical-align: middle;">Powered by</span><span style="background-color: #ffffff; padding: 6px 10px; border-radius: 4px; display: inline-block; vertical-align: middle;"><img src="AppFrontEnd/static/images/hocollogo.png" style="display: block; height: 40px; width: auto; max-width: 180px; object-fit: contain;"/></span></p>',
-        unsafe_allow_html=True,
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "AppFrontEnd", "static", "images", "hocollogo.png")
+
+
+@st.cache_resource
+def get_logo_html():
+    """Powered-by banner with the logo inlined as base64, encoded once per process"""
+    src = "AppFrontEnd/static/images/hocollogo.png"  # Fallback: use direct path
+    try:
+        with open(LOGO_PATH, "rb") as img_file:
+            src = f"data:image/png;base64,{base64.b64encode(img_file.read()).decode()}"
+    except OSError:
+        pass
+    return (
+        '<p style="text-align: right; padding: 8px 0px; margin: 0px;"><span style="color: #4a5568; font-size: 0.875rem; font-weight: 500; margin-right: 10px; vertical-align: middle;">Powered by</span>'
+        f'<span style="background-color: #ffffff; padding: 6px 10px; border-radius: 4px; display: inline-block; vertical-align: middle;"><img src="{src}" style="display: block; height: 40px; width: auto; max-width: 180px; object-fit: contain;"/></span></p>'
     )
 
+
+st.markdown(get_logo_html(), unsafe_allow_html=True)
+
 st.html(
     """
     <style>
@@ -218,6 +220,96 @@ st.html(
     """
 )
 
+# Genie turns run on a shared background pool so the rest of the page stays interactive
+@st.cache_resource
+def get_genie_executor():
+    return ThreadPoolExecutor(
+        max_workers=int(os.environ.get("GENIE_MAX_WORKERS", 8)), thread_name_prefix="genie-turn"
+    )
+
+
+# Periodic metrics export, enabled by METRICS_EXPORT_TARGET (a file path or URL)
+@st.cache_resource
+def start_metrics_export():
+    from metrics import start_exporter
+
+    return start_exporter()
+
+
+start_metrics_export()
+
+
+def submit_genie_turn(prompt, token, space_id, conversation_id, context_question=None):
+    """Start a Genie turn in the background and return its pending-state record"""
+    pending = {"status": "SUBMITTED", "preview": None, "prompt": prompt}
+
+    # Callbacks run on the worker thread, so they only update the record
+    def on_status(status, message):
+        pending["status"] = status
+
+    def on_preview(preview):
+        pending["preview"] = preview
+
+    pending["future"] = get_genie_executor().submit(
+        genie_chat,
+        prompt,
+        token,
+        space_id,
+        conversation_id=conversation_id,
+        on_status=on_status,
+        on_preview=on_preview,
+        context_question=context_question,
+    )
+    return pending
+
+
+def render_chat_message(message):
+    with st.chat_message(message["role"]):
+        content = message["content"]
+        if isinstance(content, pd.DataFrame):
+            st.dataframe(content)
+            if content.attrs.get("truncated"):
+                st.caption(
+                    f"Showing the first {len(content):,} of "
+                    f"{content.attrs.get('total_row_count') or 'more'} rows (result truncated)."
+                )
+        else:
+            st.write(content)
+
+        # Show SQL query if available
+        if message.get("query_text"):
+            with st.expander("View SQL Query"):
+                st.code(message["query_text"], language="sql")
+
+
+def show_pending_genie_turn():
+    """Show progress of the pending Genie turn, or move its answer into the history"""
+    pending = st.session_state.get("genie_pending")
+    if pending is None:
+        return
+
+    future = pending["future"]
+    if not future.done():
+        with st.chat_message("assistant"):
+            st.caption(describe_status(pending["status"]))
+            if pending["preview"] is not None:
+                st.dataframe(pending["preview"])
+        return
+
+    st.session_state.genie_pending = None
+    try:
+        conversation_id, response, query_text = future.result()
+        st.session_state.genie_conversation_id = conversation_id
+        # A cached answer opens no conversation; the next turn opens one with this question first
+        st.session_state.genie_context_question = pending["prompt"] if pending["status"] == "CACHED" else None
+        st.session_state.genie_chat_history.append(
+            {"role": "assistant", "content": response, "query_text": query_text}
+        )
+    except Exception as e:
+        st.session_state.genie_chat_history.append({"role": "assistant", "content": f"Error: {str(e)}"})
+    st.rerun()
+
+
 # Genie Chat Assistant
 with st.popover("AI Assistant"):
     # Initialize chat history
@@ -229,11 +321,7 @@ with st.popover("AI Assistant"):
 
     # Display chat history
     for message in st.session_state.genie_chat_history:
-        with st.chat_message(message["role"]):
-            if isinstance(message["content"], pd.DataFrame):
-                st.dataframe(message["content"])
-            else:
-                st.write(message["content"])
+        render_chat_message(message)
 
     # Get Genie configuration
     genie_space_id = os.environ.get("GENIE_SPACE")
@@ -242,6 +330,10 @@ with st.popover("AI Assistant"):
     if not genie_space_id or not service_token:
         st.error("Genie Space ID or Service Token not configured. Please check your environment variables.")
     else:
+        # Poll the pending turn with a fragment; reruns stop once nothing is pending
+        genie_pending = st.session_state.get("genie_pending")
+        st.fragment(run_every=1.0 if genie_pending is not None else None)(show_pending_genie_turn)()
+
         # Accept user input
         container = st.container()
         with container:
@@ -249,47 +341,170 @@ with st.popover("AI Assistant"):
                 button_b_pos = "0rem"
                 button_css = float_css_helper(width="2.2rem", bottom=button_b_pos, transition=0)
                 float_parent(css=button_css)
-            prompt = st.chat_input("Ask your question...")
+            prompt = st.chat_input("Ask your question...", disabled=genie_pending is not None)
 
         if prompt:
             # Add user message to history
             st.session_state.genie_chat_history.append({"role": "user", "content": prompt})
-            
-            # Display user message
-            with st.chat_message("user"):
-                st.write(prompt)
-
-            # Get response from Genie
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    try:
-                        response, query_text = genie_query(prompt, service_token, genie_space_id)
-                        
-                        # Display response
-                        if isinstance(response, pd.DataFrame):
-                            st.dataframe(response)
-                            st.session_state.genie_chat_history.append({"role": "assistant", "content": response})
-                            
-                            # Show SQL query if available
-                            if query_text:
-                                with st.expander("View SQL Query"):
-                                    st.code(query_text, language="sql")
-                        else:
-                            st.write(response)
-                            st.session_state.genie_chat_history.append({"role": "assistant", "content": response})
-                            
-                            # Show SQL query if available
-                            if query_text:
-                                with st.expander("View SQL Query"):
-                                    st.code(query_text, language="sql")
-                    except Exception as e:
-                        error_msg = f"Error: {str(e)}"
-                        st.error(error_msg)
-                        st.session_state.genie_chat_history.append({"role": "assistant", "content": error_msg})
+            st.session_state.genie_pending = submit_genie_turn(
+                prompt,
+                service_token,
+                genie_space_id,
+                st.session_state.get("genie_conversation_id"),
+                st.session_state.get("genie_context_question"),
+            )
+            st.rerun()
+
+# Operation groups shown on the Performance tab, by span name prefix
+PERFORMANCE_GROUPS = {
+    "Genie turns": "genie.turn.",
+    "Genie API": "genie.",
+    "Model serving": "serving.",
+    "Lakebase": "lakebase.",
+    "SQL warehouse": "warehouse.",
+    "Estimations": "estimation.",
+}
+
+
+def is_admin():
+    """Whether the viewer is listed in ADMIN_USERS (comma separated usernames)"""
+    admins = {
+        name.strip().lower()
+        for name in (get_targeted_env("ADMIN_USERS", default="") or "").split(",")
+        if name.strip()
+    }
+    try:
+        username = get_context_username()
+    except Exception:
+        return False
+    return bool(username) and username.lower() in admins
+
+
+def render_performance_tab():
+    """Latency, cache and pool health read from the in-process metrics store"""
+    import altair as alt
+    from metrics import metrics
+
+    summary = metrics.summary()
+    if not summary:
+        st.info("No operations recorded yet in this app process.")
+
+    st.markdown("**Latency by operation**")
+    group = st.selectbox("Operations", list(PERFORMANCE_GROUPS), key="performance_group")
+    prefix = PERFORMANCE_GROUPS[group]
+    names = [
+        name
+        for name in sorted(summary)
+        # Genie turns have their own group
+        if name.startswith(prefix) and (prefix == "genie.turn." or not name.startswith("genie.turn."))
+    ]
+    if names:
+        table = pd.DataFrame.from_dict({name: summary[name] for name in names}, orient="index")
+        for column in ["mean", "p50", "p95", "p99", "max"]:
+            if column in table:
+                table[column] = table[column] * 1000
+        st.dataframe(
+            table.rename(columns={column: f"{column} (ms)" for column in ["mean", "p50", "p95", "p99", "max"]}),
+            use_container_width=True,
+        )
+        samples = pd.DataFrame(
+            [(name, seconds * 1000) for name in names for seconds in metrics.samples(name)],
+            columns=["operation", "latency_ms"],
+        )
+        chart = (
+            alt.Chart(samples)
+            .mark_bar(opacity=0.7)
+            .encode(
+                x=alt.X("latency_ms:Q", bin=alt.Bin(maxbins=40), title="Latency (ms)"),
+                y=alt.Y("count():Q", stack=None, title="Calls"),
+                color="operation:N",
+            )
+        )
+        st.altair_chart(chart, use_container_width=True)
+    else:
+        st.caption(f"No {group.lower()} operations recorded yet.")
+
+    gauges = metrics.gauges()
+    caches, pools = st.columns(2)
+    with caches:
+        st.markdown("**Cache hit ratios**")
+        ratios = {
+            name: {
+                "hit_ratio": stats["hits"] / (stats["hits"] + stats["misses"]) if stats["hits"] + stats["misses"] else 0.0,
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+            }
+            for name, stats in gauges.items()
+            if "hits" in stats and "misses" in stats
+        }
+        if ratios:
+            st.dataframe(pd.DataFrame.from_dict(ratios, orient="index"), use_container_width=True)
+        else:
+            st.caption("No cache lookups yet.")
+    with pools:
+        st.markdown("**Connection pools**")
+        pool_stats = {name: stats for name, stats in gauges.items() if name.endswith("pool")}
+        if pool_stats:
+            st.dataframe(pd.DataFrame.from_dict(pool_stats, orient="index"), use_container_width=True)
+        else:
+            st.caption("No connection pools opened yet.")
+
+    surrogate_errors = gauges.get("surrogate_errors")
+    if surrogate_errors:
+        st.markdown("**Instant estimate error vs. endpoints**")
+        st.dataframe(
+            pd.DataFrame([{**gauges.get("surrogates", {}), **surrogate_errors}]), use_container_width=True, hide_index=True
+        )
+
+    st.markdown("**Slowest recent operations**")
+    slowest = metrics.slowest(limit=25)
+    if slowest:
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "operation": [span["name"] for span in slowest],
+                    "duration (ms)": [span["duration"] * 1000 for span in slowest],
+                    "status": [span["error"] or span["status"] for span in slowest],
+                    "started": pd.to_datetime([span["start_time"] for span in slowest], unit="s", utc=True),
+                    "rows": [span["rows"] for span in slowest],
+                    "bytes": [span["bytes"] for span in slowest],
+                    "inputs": [
+                        ", ".join(f"{key}={value}" for key, value in span["attributes"].items())
+                        for span in slowest
+                    ],
+                }
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    if data is not None:
+        st.markdown("**Reference data**")
+        st.caption(
+            f"Job and job phase data are cached per formation for {data.REFERENCE_DATA_TTL // 60} minutes. "
+            "Refresh them after the sync pipelines have run to pick up new wells sooner."
+        )
+        if st.button("Refresh reference data", key="refresh_reference_data"):
+            refreshed = data.invalidate_reference_data()
+            st.success(f"Reloading {refreshed} cached formation datasets in the background.")
+
+    prometheus, otlp = st.columns(2)
+    with prometheus:
+        st.download_button(
+            "Download Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain"
+        )
+    with otlp:
+        st.download_button(
+            "Download OTLP traces",
+            json.dumps(metrics.to_otlp_json()),
+            file_name="traces.json",
+            mime="application/json",
+        )
+
 
 # Initialize data tables
 try:
-    data.create_lakebase_table()
+    data.ensure_lakebase_schema()
 except Exception as e:
     st.warning(f"Could not initialize data tables: {e}")
 
@@ -347,6 +562,34 @@ with left:
         help="Please select geologic risk index",
     )
 
+    instant_estimates = st.checkbox(
+        label="Instant estimates",
+        value=False,
+        help="Show a provisional cost and days on location while adjusting the inputs. The first use per formation scores a grid of scenarios on the model endpoints in the background, and the endpoints answer until it is ready; Save always uses the endpoints.",
+    )
+    if instant_estimates and surrogate:
+        try:
+            provisional = surrogate.get_surrogate_nowait(formation)
+            if provisional is not None:
+                quick_cost, quick_dol = provisional.estimate(
+                    geo_risk_index, surface_length, inter_length, production_length
+                )
+                st.caption(f"Provisional: ${quick_cost:,.0f} · {quick_dol:,.1f} days on location")
+            else:
+                # The surrogate is built in the background; until then ask the endpoints
+                with st.spinner("Estimating on the model endpoints..."):
+                    estimate = data.estimate_well(
+                        formation, geo_risk_index, surface_length, inter_length, production_length
+                    )
+                if estimate["errors"]:
+                    raise RuntimeError(", ".join(f"{name} ({error})" for name, error in estimate["errors"].items()))
+                st.caption(
+                    f"Endpoint estimate: ${estimate['total_cost']:,.0f} · {estimate['dol']:,.1f} days on location "
+                    "(instant estimates are being prepared)"
+                )
+        except Exception as e:
+            st.warning(f"Instant estimates unavailable: {e}")
+
     do_summary = st.checkbox(
         label="Put a Review Stamp",
         value=True,
@@ -367,27 +610,45 @@ with left:
                 my_bar.empty()
             else:
                 try:
-                    percent_complete += 10
-                    my_bar.progress(percent_complete, text="Estimating costs...")
-                    cost_table, total_cost = data.update_cost_table(
-                        formation,
-                        geo_risk_index,
-                        surface_length,
-                        inter_length,
-                        production_length,
-                    )
+                    my_bar.progress(percent_complete, text="Estimating cost and time...")
 
-                    percent_complete += 30
-                    my_bar.progress(percent_complete, text="Estimating time...")
-                    time_table, dol = data.update_time_table(
+                    # Both predictions run at once; each completion moves the bar 30%
+                    def show_estimate_progress(name, completed, total):
+                        my_bar.progress(
+                            completed * 60 // total,
+                            text=f"{name.capitalize()} estimate ready ({completed}/{total})...",
+                        )
+
+                    estimate = data.estimate_well(
                         formation,
                         geo_risk_index,
                         surface_length,
                         inter_length,
                         production_length,
+                        on_complete=show_estimate_progress,
                     )
+                    if estimate["errors"]:
+                        failed = ", ".join(
+                            f"{name} ({error})" for name, error in estimate["errors"].items()
+                        )
+                        raise RuntimeError(f"Prediction failed: {failed}")
+
+                    cost_table, total_cost = estimate["cost_table"], estimate["total_cost"]
+                    time_table, dol = estimate["time_table"], estimate["dol"]
+
+                    # Track how far the instant estimate was from the endpoints
+                    provisional = surrogate.peek_surrogate(formation) if surrogate else None
+                    if provisional is not None:
+                        surrogate.record_error(
+                            formation,
+                            provisional.estimate(
+                                geo_risk_index, surface_length, inter_length, production_length
+                            ),
+                            total_cost,
+                            dol,
+                        )
+                    percent_complete = 60
 
-                    percent_complete += 20
                     my_bar.progress(percent_complete, text="Saving inputs...")
                     estimation_id = data.save_estimations(
                         api_number,
@@ -416,21 +677,28 @@ with left:
                     my_bar.empty()
                     st.success("Inputs saved successfully!")
                     st.write("Estimation ID:", estimation_id)
+                    st.caption(
+                        "Prediction time: "
+                        + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in estimate["timings"].items())
+                        + f" · prediction cache hit rate {data.prediction_cache.stats()['hit_ratio']:.0%}"
+                    )
                 except Exception as e:
                     my_bar.empty()
                     st.error(f"Failed to save estimation: {e}")
                     st.error("Please check your inputs and try again.")
 
 with right:
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(
-        [
-            "Well Locations Map",
-            "Days vs Depth",
-            "Job Cost Estimation",
-            "Job Time Estimation",
-            "Saved Estimates",
-        ]
-    )
+    tab_names = [
+        "Well Locations Map",
+        "Days vs Depth",
+        "Job Cost Estimation",
+        "Job Time Estimation",
+        "Saved Estimates",
+    ]
+    show_performance = is_admin()
+    if show_performance:
+        tab_names.append("Performance")
+    tab1, tab2, tab3, tab4, tab5, *admin_tabs = st.tabs(tab_names)
 
     with tab1:
         # Well Locations Map - Add your visualization code here
@@ -442,7 +710,8 @@ with right:
     with tab2:
         # Days vs Depth - Add your visualization code here
         st.info("Add your Days vs Depth visualization code here")
-        # Example:
+        # Example (import altair here, on first use, rather than at the top of the app):
+        # import altair as alt
         # chart = alt.Chart(data).mark_line().encode(...)
         # st.altair_chart(chart, use_container_width=True)
         pass
@@ -473,3 +742,6 @@ with right:
         #     # Save logic here
         pass
 
+    if show_performance:
+        with admin_tabs[0]:
+            render_performance_tab()
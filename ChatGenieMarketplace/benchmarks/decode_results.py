@@ -0,0 +1,118 @@
+"""
+Benchmark decoding Genie query results into DataFrames.
+
+Builds synthetic results in the shape Genie returns them (every value a string
+or None, plus a manifest schema) and compares the old object-dtype
+pd.DataFrame(data_array) with decode_query_result, both with Arrow and with
+its pandas fallback. Reports the best time of --repeat runs, the DataFrame's
+deep memory usage and how many columns came out typed (not strings).
+
+    python benchmarks/decode_results.py --rows 100000 1000000
+"""
+import argparse
+import gc
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from fake_genie import load_genie_room
+
+SCHEMA = {
+    "columns": [
+        {"name": "job_id", "type_name": "LONG"},
+        {"name": "phase", "type_name": "INT"},
+        {"name": "well", "type_name": "STRING"},
+        {"name": "depth_ft", "type_name": "DOUBLE"},
+        {"name": "cost_usd", "type_name": "DECIMAL", "type_precision": 18, "type_scale": 2},
+        {"name": "completed", "type_name": "BOOLEAN"},
+        {"name": "spud_date", "type_name": "DATE"},
+        {"name": "updated_at", "type_name": "TIMESTAMP"},
+    ]
+}
+
+
+def synthetic_result(rows: int, null_rate: float = 0.02, seed: int = 0) -> Tuple[List[List[Optional[str]]], Dict[str, Any]]:
+    """rows rows of Genie-style string values, with null_rate of them None"""
+    rng = random.Random(seed)
+    epoch = datetime(2020, 1, 1)
+    data_array = []
+    for i in range(rows):
+        updated = epoch + timedelta(seconds=rng.randrange(5 * 365 * 86400))
+        row = [
+            str(i),
+            str(rng.randrange(1, 12)),
+            f"WELL-{rng.randrange(500):03d}",
+            f"{rng.uniform(500, 15000):.1f}",
+            f"{rng.uniform(1e4, 5e6):.2f}",
+            "true" if rng.random() < 0.5 else "false",
+            updated.date().isoformat(),
+            updated.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        ]
+        data_array.append([None if j and rng.random() < null_rate else value for j, value in enumerate(row)])
+    return data_array, SCHEMA
+
+
+def decode_object(data_array, schema) -> pd.DataFrame:
+    """What process_genie_response did before typed decoding"""
+    columns = [col.get("name") for col in schema.get("columns", [])]
+    return pd.DataFrame(data_array, columns=columns)
+
+
+def _is_text(column: pd.Series) -> bool:
+    """Whether a column still holds strings (decimal.Decimal object columns count as typed)"""
+    if pd.api.types.is_object_dtype(column.dtype):
+        first = column.dropna().head(1)
+        return first.empty or isinstance(first.iloc[0], str)
+    return pd.api.types.is_string_dtype(column.dtype)
+
+
+def measure(decode: Callable, data_array, schema, repeat: int) -> Tuple[float, int, int]:
+    """(best seconds, memory bytes, typed columns) of decoding data_array"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        df = decode(data_array, schema)
+        best = min(best, time.perf_counter() - started)
+    typed = sum(1 for _, column in df.items() if not _is_text(column))
+    return best, int(df.memory_usage(deep=True).sum()), typed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    genie_room = load_genie_room()
+    arrow = genie_room._pyarrow
+
+    def decode_pandas(data_array, schema):
+        genie_room._pyarrow = lambda: None
+        try:
+            return genie_room.decode_query_result(data_array, schema)
+        finally:
+            genie_room._pyarrow = arrow
+
+    decoders = {"object DataFrame (old)": decode_object}
+    if arrow() is not None:
+        decoders["decode_query_result (Arrow)"] = genie_room.decode_query_result
+    else:
+        print("pyarrow is not installed; only the pandas fallback is measured")
+    decoders["decode_query_result (pandas)"] = decode_pandas
+
+    print(f"{'rows':<10}{'decoder':<32}{'best s':>9}{'memory MB':>11}{'typed cols':>12}")
+    for rows in args.rows:
+        data_array, schema = synthetic_result(rows)
+        for name, decode in decoders.items():
+            seconds, memory, typed = measure(decode, data_array, schema, args.repeat)
+            typed_columns = f"{typed}/{len(schema['columns'])}"
+            print(f"{rows:<10}{name:<32}{seconds:>9.3f}{memory / 1e6:>11.1f}{typed_columns:>12}")
+        del data_array
+
+
+if __name__ == "__main__":
+    main()
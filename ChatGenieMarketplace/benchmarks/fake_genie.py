@@ -0,0 +1,260 @@
+"""
+Local stand-in for the Genie API, used by the benchmark scripts and tests/.
+
+FakeGenieServer plays every message through a randomly drawn status timeline
+(SUBMITTED -> ... -> EXECUTING_QUERY -> COMPLETED) and counts the requests it
+receives. Its workspace_client method replaces WorkspaceClient in genie_room,
+so the real GenieClient, AsyncGenieClient and genie_query code paths run
+unchanged against it.
+
+Time comes from a clock object with monotonic() and sleep(): the time module
+for wall-clock runs, or VirtualClock for single-threaded runs that finish
+instantly.
+"""
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import types
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (status, (min seconds, max seconds)) in the order Genie reports them
+DEFAULT_STAGES = [
+    ("SUBMITTED", (0.1, 0.4)),
+    ("FETCHING_METADATA", (0.2, 0.8)),
+    ("FILTERING_CONTEXT", (0.3, 1.2)),
+    ("ASKING_AI", (1.5, 6.0)),
+    ("PENDING_WAREHOUSE", (0.0, 2.0)),
+    ("EXECUTING_QUERY", (0.5, 4.0)),
+]
+
+RESULT_SCHEMA = {
+    "columns": [
+        {"name": "job_id", "type_name": "INT"},
+        {"name": "well", "type_name": "STRING"},
+        {"name": "cost", "type_name": "DOUBLE"},
+    ]
+}
+
+
+class VirtualClock:
+    """Clock whose sleep() advances time instantly; not thread-safe"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(seconds, 0.0)
+
+
+class _Response(types.SimpleNamespace):
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class FakeGenieServer:
+    """
+    In-process Genie API with scripted message timelines.
+
+    Every API call costs request_latency seconds on the clock. Stage durations
+    are drawn from stages and multiplied by time_scale; messages end in
+    final_status, and COMPLETED ones carry a query attachment with
+    rows_per_answer rows. Follow-ups to a conversation passed to
+    expire_conversation fail the way Genie reports an expired conversation.
+    """
+
+    def __init__(
+        self,
+        clock=time,
+        stages: Optional[List[Tuple[str, Tuple[float, float]]]] = None,
+        time_scale: float = 1.0,
+        request_latency: float = 0.05,
+        rows_per_answer: int = 20,
+        final_status: str = "COMPLETED",
+        seed: int = 0,
+    ):
+        self.clock = clock
+        self.stages = stages or DEFAULT_STAGES
+        self.time_scale = time_scale
+        self.request_latency = request_latency
+        self.rows_per_answer = rows_per_answer
+        self.final_status = final_status
+        self.expired_conversations = set()
+        self.random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.token = f"fake-token-{uuid.uuid4().hex}"
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _request(self, name: str, message_id: Optional[str] = None):
+        with self._lock:
+            self.requests[name] += 1
+            if message_id is not None:
+                self.messages[message_id]["requests"] += 1
+        self.clock.sleep(self.request_latency)
+
+    def _new_message(self, conversation_id: str, content: str) -> str:
+        with self._lock:
+            message_id = f"msg-{next(self._ids)}"
+            started = self.clock.monotonic()
+            timeline = []
+            elapsed = 0.0
+            for status, (low, high) in self.stages:
+                timeline.append((elapsed, status))
+                elapsed += self.random.uniform(low, high) * self.time_scale
+            timeline.append((elapsed, self.final_status))
+            self.messages[message_id] = {
+                "conversation_id": conversation_id,
+                "content": content,
+                "started": started,
+                "timeline": timeline,
+                "completed_at": started + elapsed,
+                "requests": 0,
+            }
+        return message_id
+
+    def _status(self, message_id: str) -> str:
+        message = self.messages[message_id]
+        elapsed = self.clock.monotonic() - message["started"]
+        status = message["timeline"][0][1]
+        for offset, name in message["timeline"]:
+            if elapsed >= offset:
+                status = name
+        return status
+
+    def expire_conversation(self, conversation_id: str):
+        self.expired_conversations.add(conversation_id)
+
+    def answer_delay(self, message_id: str) -> float:
+        """Seconds between a message being created and it completing"""
+        message = self.messages[message_id]
+        return message["completed_at"] - message["started"]
+
+    def workspace_client(self, config=None) -> types.SimpleNamespace:
+        """Drop-in for WorkspaceClient(config=...)"""
+        return types.SimpleNamespace(genie=_FakeGenieAPI(self), statement_execution=None)
+
+
+class _FakeGenieAPI:
+    """The subset of WorkspaceClient.genie that genie_room calls"""
+
+    def __init__(self, server: FakeGenieServer):
+        self.server = server
+
+    def start_conversation(self, space_id: str, content: str):
+        server = self.server
+        server._request("start_conversation")
+        conversation_id = f"conv-{next(server._ids)}"
+        return _Response(conversation_id=conversation_id, message_id=server._new_message(conversation_id, content))
+
+    def send_message(self, space_id: str, conversation_id: str, content: str):
+        self.server._request("send_message")
+        if conversation_id in self.server.expired_conversations:
+            raise RuntimeError(f"RESOURCE_DOES_NOT_EXIST: Conversation not found: {conversation_id}")
+        return _Response(message_id=self.server._new_message(conversation_id, content))
+
+    def get_message(self, space_id: str, conversation_id: str, message_id: str):
+        server = self.server
+        server._request("get_message", message_id)
+        status = server._status(message_id)
+        response = _Response(
+            conversation_id=conversation_id,
+            message_id=message_id,
+            status=status,
+            content=server.messages[message_id]["content"],
+        )
+        if status == "COMPLETED":
+            response.attachments = [{"attachment_id": f"{message_id}-a", "query": {"query": "SELECT job_id, well, cost FROM jobs"}}]
+        return response
+
+    def get_message_attachment_query_result(self, space_id: str, conversation_id: str, message_id: str, attachment_id: str):
+        server = self.server
+        server._request("get_message_attachment_query_result")
+        rows = [[str(i), f"WELL-{i % 7}", f"{i * 1.5:.2f}"] for i in range(server.rows_per_answer)]
+        manifest = types.SimpleNamespace(
+            schema=_Response(**RESULT_SCHEMA),
+            total_chunk_count=1,
+            total_row_count=len(rows),
+            truncated=False,
+        )
+        result = types.SimpleNamespace(data_array=rows, external_links=None, chunk_index=0, next_chunk_index=None)
+        statement = types.SimpleNamespace(statement_id=f"{message_id}-stmt", manifest=manifest, result=result)
+        return types.SimpleNamespace(statement_response=statement)
+
+
+def _stub_module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install_missing_modules():
+    """
+    Register empty stand-ins for the app dependencies genie_room and the
+    AppFrontEnd modules import but the benchmarks and tests never call
+    (requests, dotenv, streamlit, the Databricks SDK), for machines where they
+    are not installed. Installed packages are used as is.
+    """
+    def missing(name: str) -> bool:
+        try:
+            __import__(name)
+            return False
+        except ImportError:
+            return True
+
+    if missing("requests"):
+        _stub_module("requests")
+    if missing("dotenv"):
+        _stub_module("dotenv", load_dotenv=lambda *args, **kwargs: False)
+    if missing("streamlit"):
+        _stub_module("streamlit")
+    if missing("databricks.sdk"):
+        class Config:
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+
+        class WorkspaceClient:
+            def __init__(self, *args, **kwargs):
+                raise RuntimeError("the Databricks SDK is not installed; use FakeGenieServer.workspace_client")
+
+        databricks = sys.modules.get("databricks") or _stub_module("databricks", __path__=[])
+        databricks.sdk = _stub_module("databricks.sdk", __path__=[], WorkspaceClient=WorkspaceClient)
+        databricks.sdk.core = _stub_module("databricks.sdk.core", Config=Config)
+        databricks.sdk.service = _stub_module("databricks.sdk.service", __path__=[])
+        databricks.sdk.service.iam = _stub_module("databricks.sdk.service.iam", User=object)
+
+
+def load_genie_room(server: Optional[FakeGenieServer] = None):
+    """Import genie_room with its WorkspaceClient pointed at server"""
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    os.environ.setdefault("DATABRICKS_HOST", "fake-genie.local")
+    install_missing_modules()
+
+    import genie_room
+
+    if server is not None:
+        use_server(genie_room, server)
+    return genie_room
+
+
+def use_server(genie_room, server: FakeGenieServer):
+    """
+    Point genie_room at server. Genie clients are shared per token, so callers
+    pass server.token to reach this server rather than one set up earlier.
+    """
+    genie_room.WorkspaceClient = server.workspace_client
@@ -0,0 +1,97 @@
+"""
+Benchmark concurrent Genie questions against the fake Genie server.
+
+For each concurrency level the same number of questions is answered twice:
+by the sync path, one blocked thread per in-flight question as with one
+Streamlit session each, and by genie_query_many on one event loop. Reports
+wall time, answers per second and the peak number of live threads. The fake
+server runs on the wall clock with its stage durations multiplied by
+--time-scale, so a run takes a few tens of seconds.
+
+    python benchmarks/genie_concurrency.py --levels 1 10 100
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from fake_genie import FakeGenieServer, load_genie_room, use_server
+
+SPACE_ID = "bench-space"
+
+
+class ThreadSampler:
+    """Record the highest threading.active_count() seen while running"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def ask_sync(genie_room, questions: List[str], token: str, concurrency: int) -> list:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda question: genie_room.genie_query(question, token, SPACE_ID, use_cache=False), questions))
+
+
+def ask_async(genie_room, questions: List[str], token: str, concurrency: int) -> list:
+    return asyncio.run(genie_room.genie_query_many(questions, token, SPACE_ID, max_concurrency=concurrency))
+
+
+def run(genie_room, ask: Callable, concurrency: int, rounds: int, time_scale: float, request_latency: float, seed: int) -> Dict[str, float]:
+    server = FakeGenieServer(time_scale=time_scale, request_latency=request_latency, seed=seed)
+    use_server(genie_room, server)
+    questions = [f"question {i}" for i in range(concurrency * rounds)]
+
+    with ThreadSampler() as sampler:
+        started = time.perf_counter()
+        results = ask(genie_room, questions, server.token, concurrency)
+        elapsed = time.perf_counter() - started
+
+    answered = sum(1 for result, _ in results if not isinstance(result, str))
+    return {
+        "answered": answered,
+        "seconds": elapsed,
+        "answers_per_s": answered / elapsed,
+        "peak_threads": sampler.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 100], help="concurrent questions")
+    parser.add_argument("--rounds", type=int, default=2, help="questions per concurrency slot")
+    parser.add_argument("--time-scale", type=float, default=0.25, help="multiplier on the fake server's stage durations")
+    parser.add_argument("--request-latency", type=float, default=0.05, help="seconds per Genie API round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    genie_room = load_genie_room()
+    paths = {"sync threads": ask_sync, "genie_query_many": ask_async}
+
+    print(f"{args.rounds} questions per slot, stage durations x{args.time_scale}, {args.request_latency * 1000:.0f} ms per request")
+    print(f"{'concurrency':<13}{'path':<18}{'answered':>10}{'seconds':>10}{'answers/s':>11}{'peak threads':>14}")
+    for concurrency in args.levels:
+        for name, ask in paths.items():
+            stats = run(genie_room, ask, concurrency, args.rounds, args.time_scale, args.request_latency, args.seed)
+            print(f"{concurrency:<13}{name:<18}{stats['answered']:>10}{stats['seconds']:>10.2f}{stats['answers_per_s']:>11.2f}{stats['peak_threads']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark Genie completion polling against the fake Genie server.
+
+Compares the old waiter (get_message every 2 s) with
+GenieClient.wait_for_message_completion (adaptive, status-aware backoff) on
+the same set of message timelines, and reports the median time-to-answer, how
+long each waiter lags behind the actual completion, and get_message requests
+per answer. Time is virtual, so the run takes well under a second.
+
+    python benchmarks/genie_polling.py --answers 500
+"""
+import argparse
+import random
+import statistics
+from typing import Any, Callable, Dict, List
+
+from fake_genie import FakeGenieServer, VirtualClock, load_genie_room, use_server
+
+SPACE_ID = "bench-space"
+
+
+def wait_fixed_interval(client, conversation_id: str, message_id: str, clock, timeout: float = 300, poll_interval: float = 2.0) -> Dict[str, Any]:
+    """The waiter GenieClient used before adaptive polling, on the given clock"""
+    started = clock.monotonic()
+    while clock.monotonic() - started < timeout:
+        message = client.get_message(conversation_id, message_id)
+        if message.get("status") in ["COMPLETED", "ERROR", "FAILED"]:
+            return message
+        clock.sleep(poll_interval)
+    raise TimeoutError(f"Message processing timed out after {timeout} seconds")
+
+
+def percentile(values: List[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run(genie_room, wait: Callable, answers: int, request_latency: float, seed: int) -> Dict[str, float]:
+    """Ask answers questions one after another and summarize the waits"""
+    clock = VirtualClock()
+    server = FakeGenieServer(clock=clock, request_latency=request_latency, seed=seed)
+    use_server(genie_room, server)
+    genie_room.time = clock
+    random.seed(seed)
+    client = genie_room.get_genie_client(host=genie_room.DATABRICKS_HOST, space_id=SPACE_ID, token=server.token)
+
+    time_to_answer, lag, polls = [], [], []
+    for i in range(answers):
+        started = clock.monotonic()
+        response = client.start_conversation(f"question {i}")
+        message_id = response["message_id"]
+        message = wait(client, response["conversation_id"], message_id, clock)
+        assert message["status"] == "COMPLETED", message["status"]
+        answered = clock.monotonic()
+        time_to_answer.append(answered - started)
+        lag.append(answered - server.messages[message_id]["completed_at"])
+        polls.append(server.messages[message_id]["requests"])
+
+    return {
+        "median_s": statistics.median(time_to_answer),
+        "p95_s": percentile(time_to_answer, 95),
+        "median_lag_s": statistics.median(lag),
+        "polls_per_answer": statistics.mean(polls),
+        "p95_polls": percentile(polls, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=200, help="questions asked per waiter")
+    parser.add_argument("--request-latency", type=float, default=0.05, help="seconds per Genie API round trip")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    genie_room = load_genie_room()
+    real_time = genie_room.time
+    waiters = {
+        "fixed 2 s (old)": wait_fixed_interval,
+        "adaptive": lambda client, conversation_id, message_id, clock: client.wait_for_message_completion(conversation_id, message_id),
+    }
+
+    print(f"{args.answers} answers per waiter, {args.request_latency * 1000:.0f} ms per request")
+    print(f"{'waiter':<18}{'median s':>10}{'p95 s':>10}{'median lag s':>14}{'polls/answer':>14}{'p95 polls':>11}")
+    try:
+        for name, wait in waiters.items():
+            stats = run(genie_room, wait, args.answers, args.request_latency, args.seed)
+            print(f"{name:<18}{stats['median_s']:>10.2f}{stats['p95_s']:>10.2f}{stats['median_lag_s']:>14.2f}{stats['polls_per_answer']:>14.1f}{stats['p95_polls']:>11.0f}")
+    finally:
+        genie_room.time = real_time
+
+
+if __name__ == "__main__":
+    main()
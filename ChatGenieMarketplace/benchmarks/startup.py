@@ -0,0 +1,179 @@
+"""
+Benchmark the app's cold-start imports and per-rerun banner cost.
+
+Cold start: in fresh interpreters, times importing the app's own modules
+(genie_room, AppFrontEnd's data and surrogate, and every module-level import
+of app.py) and lists which heavy third-party modules each one loads. Pandas
+on its own is measured as the floor. Dependencies that are not installed get
+the stand-ins from fake_genie and are listed; modules app.py imports inside
+try/except ImportError are skipped when missing, as the app does.
+
+Per rerun: times building the powered-by banner the old way (read and
+base64-encode the logo on every rerun) against get_logo_html from app.py,
+which encodes it once per process.
+
+    python benchmarks/startup.py --runs 5 --reruns 10000
+"""
+import argparse
+import ast
+import base64
+import functools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+from typing import Callable, Dict, List, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARK_DIR)
+APP_PATH = os.path.join(APP_DIR, "app.py")
+
+# Slow third-party imports the app should only pay for when a feature needs them
+HEAVY_MODULES = ["pyarrow", "altair", "databricks.sql", "psycopg2", "numpy", "pandas", "streamlit", "databricks.sdk"]
+
+# What a fresh interpreter imports for each measurement
+TARGETS = {
+    "pandas alone": ["pandas"],
+    "genie_room": ["genie_room"],
+    "data + surrogate": ["data", "surrogate"],
+    "app.py imports": [APP_PATH],
+}
+
+
+def app_imports(path: str) -> List[ast.stmt]:
+    """The import statements app.py runs at module level, including those inside top-level try blocks"""
+    with open(path) as f:
+        body = ast.parse(f.read(), path).body
+    imports = []
+    while body:
+        node, body = body[0], body[1:]
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(node)
+        elif isinstance(node, ast.Try):
+            body = node.body + body
+    return imports
+
+
+def import_in_this_process(names: List[str]) -> Dict[str, object]:
+    """Import names (module names, or app.py for its module-level imports) and report the cost"""
+    started = time.perf_counter()
+    stubbed = []
+    if names != ["pandas"]:
+        sys.path[:0] = [BENCHMARK_DIR, APP_DIR, os.path.join(APP_DIR, "AppFrontEnd")]
+        os.environ.setdefault("DATABRICKS_HOST", "fake-genie.local")
+        import fake_genie
+
+        before = set(sys.modules)
+        fake_genie.install_missing_modules()
+        stubbed = sorted(name for name in set(sys.modules) - before if getattr(sys.modules[name], "__file__", None) is None)
+    skipped = []
+    for name in names:
+        if name != APP_PATH:
+            __import__(name)
+            continue
+        for node in app_imports(name):
+            try:
+                exec(compile(ast.Module(body=[node], type_ignores=[]), name, "exec"), {})
+            except ImportError:
+                skipped.append(ast.unparse(node))
+    return {
+        "seconds": time.perf_counter() - started,
+        "loaded": [module for module in HEAVY_MODULES if module in sys.modules and module not in stubbed],
+        "stubbed": stubbed,
+        "skipped": skipped,
+    }
+
+
+def time_imports(names: List[str], runs: int) -> Tuple[float, Dict[str, object]]:
+    """(median seconds, report of the last run) of importing names in fresh interpreters"""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--import", *names],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        timings.append(report["seconds"])
+    return statistics.median(timings), report
+
+
+def old_logo_html() -> str:
+    """The banner as app.py built it on every rerun before get_logo_html"""
+    logo_path = os.path.join(APP_DIR, "AppFrontEnd", "static", "images", "hocollogo.png")
+    if os.path.exists(logo_path):
+        with open(logo_path, "rb") as img_file:
+            img_data = base64.b64encode(img_file.read()).decode()
+            return f'<p style="text-align: right;"><img src="data:image/png;base64,{img_data}"/></p>'
+    return '<p style="text-align: right;"><img src="AppFrontEnd/static/images/hocollogo.png"/></p>'
+
+
+def load_get_logo_html() -> Callable[[], str]:
+    """
+    Execute LOGO_PATH and get_logo_html from app.py on their own, with
+    st.cache_resource standing in as functools.cache (running the whole
+    script would need a Streamlit session and a workspace).
+    """
+    with open(APP_PATH) as f:
+        tree = ast.parse(f.read(), APP_PATH)
+    wanted = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "get_logo_html":
+            wanted.append(node)
+        elif isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "LOGO_PATH" for target in node.targets):
+            wanted.append(node)
+    namespace = {
+        "__file__": APP_PATH,
+        "os": os,
+        "base64": base64,
+        "st": types.SimpleNamespace(cache_resource=functools.cache),
+    }
+    exec(compile(ast.Module(body=wanted, type_ignores=[]), APP_PATH, "exec"), namespace)
+    return namespace["get_logo_html"]
+
+
+def time_reruns(build: Callable[[], str], reruns: int) -> Tuple[float, float]:
+    """(seconds for the first call, mean seconds per call after it)"""
+    started = time.perf_counter()
+    build()
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(reruns):
+        build()
+    return first, (time.perf_counter() - started) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per import target")
+    parser.add_argument("--reruns", type=int, default=10000, help="banner builds per variant")
+    parser.add_argument("--import", dest="child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(import_in_this_process(args.child)))
+        return
+
+    print(f"{'cold start imports':<26}{'median s':>10}  heavy modules loaded")
+    notes = set()
+    for name, modules in TARGETS.items():
+        seconds, report = time_imports(modules, args.runs)
+        print(f"{name:<26}{seconds:>10.3f}  {', '.join(report['loaded']) or '-'}")
+        notes.update(f"stand-in for {module}" for module in report["stubbed"] if module in HEAVY_MODULES or "." not in module)
+        notes.update(f"skipped {statement}" for statement in report["skipped"])
+    for note in sorted(notes):
+        print(f"  ({note})")
+
+    print()
+    print(f"{'banner per rerun':<26}{'first ms':>10}{'rerun us':>10}")
+    for name, build in (("read + encode (old)", old_logo_html), ("get_logo_html", load_get_logo_html())):
+        first, per_rerun = time_reruns(build, args.reruns)
+        print(f"{name:<26}{first * 1e3:>10.3f}{per_rerun * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
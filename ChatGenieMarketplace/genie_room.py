@@ -1,12 +1,36 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import decimal
+import functools
+import hashlib
+import itertools
+import json
+import re
+import shutil
+import numpy as np
 import pandas as pd
+import random
+import requests
+import threading
 import time
 import os
+import sys
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, List, Union, Tuple
+from typing import Dict, Any, Optional, List, Union, Tuple, Callable, Iterator
 import logging
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.core import Config
 
+# Shared helpers live in AppFrontEnd
+app_frontend_path = os.path.join(os.path.dirname(__file__), "AppFrontEnd")
+if app_frontend_path not in sys.path:
+    sys.path.insert(0, app_frontend_path)
+
+from cache import TTLCache
+from metrics import metrics, traced
+from utils import auth_identity, client_registry
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -15,6 +39,117 @@ load_dotenv()
 # Load environment variables
 DATABRICKS_HOST = os.environ.get("DATABRICKS_HOST")
 
+# Upper bound on the (estimated) size of a query result held in memory
+RESULT_MAX_BYTES = int(os.environ.get("GENIE_RESULT_MAX_BYTES", 256 * 1024 * 1024))
+
+# Number of result chunks fetched concurrently after the first one
+RESULT_FETCH_WORKERS = int(os.environ.get("GENIE_RESULT_FETCH_WORKERS", 4))
+
+# Threads shared by AsyncGenieClient requests that are not given an executor
+ASYNC_WORKERS = int(os.environ.get("GENIE_ASYNC_WORKERS", 32))
+
+# Answer cache in front of genie_query; GENIE_ANSWER_CACHE_DIR enables the on-disk tier
+ANSWER_CACHE_TTL = int(os.environ.get("GENIE_ANSWER_CACHE_TTL", 900))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("GENIE_ANSWER_CACHE_MAX_ENTRIES", 256))
+ANSWER_CACHE_MAX_BYTES = int(os.environ.get("GENIE_ANSWER_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+ANSWER_CACHE_DIR = os.environ.get("GENIE_ANSWER_CACHE_DIR")
+
+# Message statuses after which Genie will not update the message any further
+TERMINAL_STATUSES = {"COMPLETED", "ERROR", "FAILED", "CANCELLED", "QUERY_RESULT_EXPIRED"}
+
+# Human readable progress text for the intermediate Genie statuses
+STATUS_DESCRIPTIONS = {
+    "SUBMITTED": "Question submitted...",
+    "FETCHING_METADATA": "Reading table metadata...",
+    "FILTERING_CONTEXT": "Selecting relevant tables...",
+    "ASKING_AI": "Generating SQL...",
+    "PENDING_WAREHOUSE": "Waiting for the SQL warehouse...",
+    "EXECUTING_QUERY": "Running the query...",
+    "COMPLETED": "Answer ready",
+    "CACHED": "Answer ready (from cache)",
+    "FAILED": "Genie could not answer the question",
+    "ERROR": "Genie could not answer the question",
+    "CANCELLED": "Question cancelled",
+    "QUERY_RESULT_EXPIRED": "Query result expired",
+}
+
+# A running query can finish at any moment, so it is polled more often than the other
+# stages; no cap is ever above the max_poll_interval passed to the poller (2 s by default)
+STATUS_MAX_POLL_INTERVAL = {
+    "EXECUTING_QUERY": 1.0,
+}
+
+# Statuses after which the answer usually follows quickly, so polling starts fast again
+STATUS_RESET_POLL_INTERVAL = {"EXECUTING_QUERY"}
+
+# The fixed interval of the old waiter; the default poll budget never exceeds what it spent
+LEGACY_POLL_INTERVAL = 2.0
+
+StatusCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def _estimate_row_bytes(row: List[Optional[str]]) -> int:
+    """Rough in-memory size of a row of string values"""
+    return sum(len(value) + 50 if value is not None else 8 for value in row)
+
+
+def describe_status(status: Optional[str]) -> str:
+    """Return a short progress description for a Genie message status"""
+    return STATUS_DESCRIPTIONS.get(status or "", "Thinking...")
+
+
+class _PollSchedule:
+    """
+    When to poll a Genie message next; shared by the sync and async waiters.
+
+    The interval starts at initial_poll_interval and grows by backoff_factor
+    (jittered, jitter only ever shortening a delay) up to the cap for the
+    current status. It keeps growing across status changes except on the move
+    to a STATUS_RESET_POLL_INTERVAL status. Polling ends with TimeoutError
+    after timeout seconds or max_polls polls; by default max_polls is the
+    number of polls the old fixed 2 s loop could make within the timeout.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 300,
+        initial_poll_interval: float = 0.5,
+        max_poll_interval: float = 2.0,
+        backoff_factor: float = 2.0,
+        jitter: float = 0.2,
+        max_polls: Optional[int] = None,
+    ):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.max_polls = max_polls if max_polls is not None else int(timeout // LEGACY_POLL_INTERVAL) + 1
+        self.interval = initial_poll_interval
+        self.polls = 0
+        self.status: Optional[str] = None
+
+    def observe(self, status: Optional[str]) -> bool:
+        """Record the status returned by a poll; returns whether it changed"""
+        self.polls += 1
+        if status == self.status:
+            return False
+        if status in STATUS_RESET_POLL_INTERVAL:
+            self.interval = self.initial_poll_interval
+        self.status = status
+        return True
+
+    def next_delay(self) -> float:
+        """Seconds to wait before the next poll; raises TimeoutError when out of time or polls"""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0 or self.polls >= self.max_polls:
+            raise TimeoutError(f"Message processing timed out after {self.timeout} seconds ({self.polls} polls)")
+        cap = min(STATUS_MAX_POLL_INTERVAL.get(self.status, self.max_poll_interval), self.max_poll_interval)
+        delay = min(self.interval, cap) * random.uniform(1 - self.jitter, 1)
+        self.interval = min(self.interval * self.backoff_factor, cap)
+        return min(delay, remaining)
+
 class GenieClient:
     def __init__(self, host: str, space_id: str, token: str):
         self.host = host
@@ -34,6 +169,7 @@ class GenieClient:
         
         self.client = WorkspaceClient(config=config)
     
+    @traced("genie.start_conversation")
     def start_conversation(self, question: str) -> Dict[str, Any]:
         """Start a new conversation with the given question"""
         response = self.client.genie.start_conversation(
@@ -45,6 +181,7 @@ class GenieClient:
             "message_id": response.message_id
         }
     
+    @traced("genie.send_message")
     def send_message(self, conversation_id: str, message: str) -> Dict[str, Any]:
         """Send a follow-up message to an existing conversation"""
         response = self.client.genie.send_message(
@@ -56,6 +193,7 @@ class GenieClient:
             "message_id": response.message_id
         }
 
+    @traced("genie.get_message")
     def get_message(self, conversation_id: str, message_id: str) -> Dict[str, Any]:
         """Get the details of a specific message"""
         response = self.client.genie.get_message(
@@ -65,36 +203,157 @@ class GenieClient:
         )
         return response.as_dict()
 
-    def get_query_result(self, conversation_id: str, message_id: str, attachment_id: str) -> Dict[str, Any]:
-        """Get the query result using the attachment_id endpoint"""
-        response = self.client.genie.get_message_attachment_query_result(
-            space_id=self.space_id,
-            conversation_id=conversation_id,
-            message_id=message_id,
-            attachment_id=attachment_id
-        )
+    def _result_rows(self, result) -> List[List[Optional[str]]]:
+        """Return the rows of a result chunk, downloading external links if needed"""
+        rows = list(result.data_array or [])
+        for link in result.external_links or []:
+            download = requests.get(link.external_link, timeout=60)
+            download.raise_for_status()
+            rows.extend(download.json())
+        return rows
+
+    def _fetch_chunk(self, statement_id: str, chunk_index: int) -> Tuple[List[List[Optional[str]]], Optional[int]]:
+        """Fetch one result chunk; returns (rows, next_chunk_index)"""
+        with metrics.span("genie.fetch_chunk", statement_id=statement_id, chunk_index=chunk_index) as span:
+            result = self.client.statement_execution.get_statement_result_chunk_n(
+                statement_id=statement_id,
+                chunk_index=chunk_index
+            )
+            rows = self._result_rows(result)
+            span.add_rows(len(rows))
+            span.add_bytes(sum(_estimate_row_bytes(row) for row in rows))
+            return rows, result.next_chunk_index
+
+    def iter_query_result_chunks(self, conversation_id: str, message_id: str, attachment_id: str, max_workers: int = RESULT_FETCH_WORKERS) -> Iterator[Dict[str, Any]]:
+        """
+        Yield a query result chunk by chunk, in order.
+
+        Each item is a dict with 'data_array', 'schema', 'chunk_index',
+        'total_chunk_count', 'total_row_count' and 'truncated' (set when the
+        warehouse itself truncated the result). When the chunk count is known,
+        up to max_workers chunks are fetched ahead in parallel; closing the
+        generator early cancels the fetches that have not started.
+        """
+        with metrics.span("genie.get_attachment_query_result", message_id=message_id, attachment_id=attachment_id):
+            response = self.client.genie.get_message_attachment_query_result(
+                space_id=self.space_id,
+                conversation_id=conversation_id,
+                message_id=message_id,
+                attachment_id=attachment_id
+            )
         
-        # Extract data_array from the correct nested location
-        data_array = []
-        if hasattr(response, 'statement_response') and response.statement_response is not None:
-            if (hasattr(response.statement_response, 'result') and 
-                response.statement_response.result is not None):
-                data_array = response.statement_response.result.data_array or []
-            else:
-                raise ValueError("Query execution failed: No result data available. The query may have failed or returned no data.")
-        else:
+        statement = getattr(response, 'statement_response', None)
+        if statement is None:
             raise ValueError("Query execution failed: No statement response available from the server.")
+        if getattr(statement, 'result', None) is None:
+            raise ValueError("Query execution failed: No result data available. The query may have failed or returned no data.")
         
         # Extract schema safely
+        manifest = getattr(statement, 'manifest', None)
         schema = {}
-        if (hasattr(response, 'statement_response') and response.statement_response is not None and
-            hasattr(response.statement_response, 'manifest') and response.statement_response.manifest is not None and
-            hasattr(response.statement_response.manifest, 'schema') and response.statement_response.manifest.schema is not None):
-            schema = response.statement_response.manifest.schema.as_dict()
-            
+        if manifest is not None and getattr(manifest, 'schema', None) is not None:
+            schema = manifest.schema.as_dict()
+        total_chunk_count = getattr(manifest, 'total_chunk_count', None)
+
+        def chunk(rows, chunk_index):
+            return {
+                'data_array': rows,
+                'schema': schema,
+                'chunk_index': chunk_index,
+                'total_chunk_count': total_chunk_count,
+                'total_row_count': getattr(manifest, 'total_row_count', None),
+                'truncated': bool(getattr(manifest, 'truncated', False)),
+            }
+
+        result = statement.result
+        yield chunk(self._result_rows(result), result.chunk_index or 0)
+
+        next_index = result.next_chunk_index
+        if next_index is None:
+            return
+
+        # Without a known chunk count, follow next_chunk_index one chunk at a time
+        if total_chunk_count is None or max_workers <= 1:
+            while next_index is not None:
+                rows, following = self._fetch_chunk(statement.statement_id, next_index)
+                yield chunk(rows, next_index)
+                next_index = following
+            return
+
+        pending = []
+        indexes = iter(range(next_index, total_chunk_count))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            try:
+                for index in indexes:
+                    pending.append((index, pool.submit(self._fetch_chunk, statement.statement_id, index)))
+                    if len(pending) >= max_workers:
+                        break
+                while pending:
+                    index, future = pending.pop(0)
+                    rows, _ = future.result()
+                    following = next(indexes, None)
+                    if following is not None:
+                        pending.append((following, pool.submit(self._fetch_chunk, statement.statement_id, following)))
+                    yield chunk(rows, index)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def get_query_result(
+        self,
+        conversation_id: str,
+        message_id: str,
+        attachment_id: str,
+        max_bytes: int = RESULT_MAX_BYTES,
+        on_first_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Get the query result using the attachment_id endpoint.
+
+        All chunks are read until max_bytes (an estimate of the in-memory size)
+        is reached; 'truncated' in the result reports whether rows are missing.
+        on_first_chunk, if given, is called with the first chunk while the
+        remaining chunks are still loading.
+        """
+        data_array = []
+        schema = {}
+        truncated = False
+        over_cap = False
+        size = 0
+        total_row_count = None
+
+        with metrics.span("genie.get_query_result", message_id=message_id, attachment_id=attachment_id) as span:
+            chunks = self.iter_query_result_chunks(conversation_id, message_id, attachment_id)
+            try:
+                for item in chunks:
+                    schema = item['schema']
+                    total_row_count = item['total_row_count']
+                    truncated = truncated or item['truncated']
+                    if item['chunk_index'] == 0 and on_first_chunk is not None and item['total_chunk_count'] not in (None, 1):
+                        on_first_chunk(item)
+
+                    for row in item['data_array']:
+                        size += _estimate_row_bytes(row)
+                        if size > max_bytes:
+                            over_cap = True
+                            break
+                        data_array.append(row)
+
+                    if over_cap:
+                        logger.warning(f"Query result truncated at {len(data_array)} rows ({max_bytes} byte cap)")
+                        truncated = True
+                        break
+            finally:
+                chunks.close()
+            span.add_rows(len(data_array))
+            span.add_bytes(size)
+            span.set(truncated=truncated)
+
         return {
             'data_array': data_array,
-            'schema': schema
+            'schema': schema,
+            'truncated': truncated,
+            'total_row_count': total_row_count,
         }
 
     def execute_query(self, conversation_id: str, message_id: str, attachment_id: str) -> Dict[str, Any]:
@@ -107,33 +366,160 @@ class GenieClient:
         )
         return response.as_dict()
 
-    def wait_for_message_completion(self, conversation_id: str, message_id: str, timeout: int = 300, poll_interval: int = 2) -> Dict[str, Any]:
+    def iter_message_status(
+        self,
+        conversation_id: str,
+        message_id: str,
+        timeout: float = 300,
+        initial_poll_interval: float = 0.5,
+        max_poll_interval: float = 2.0,
+        backoff_factor: float = 2.0,
+        jitter: float = 0.2,
+        max_polls: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Wait for a message to reach a terminal state (COMPLETED, ERROR, etc.).
+        Poll a message and yield it every time its status changes.
+
+        Polling starts fast and backs off exponentially (with jitter) up to a
+        per-status cap, speeding up again once the query runs; see
+        _PollSchedule. The generator ends after yielding a message in a
+        terminal state.
         """
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
+        schedule = _PollSchedule(timeout, initial_poll_interval, max_poll_interval, backoff_factor, jitter, max_polls)
+
+        while True:
             message = self.get_message(conversation_id, message_id)
             status = message.get("status")
-            
-            if status in ["COMPLETED", "ERROR", "FAILED"]:
-                return message
-                
-            time.sleep(poll_interval)
-            
-        raise TimeoutError(f"Message processing timed out after {timeout} seconds")
+
+            if schedule.observe(status):
+                yield message
+
+            if status in TERMINAL_STATUSES:
+                return
+
+            time.sleep(schedule.next_delay())
+
+    def wait_for_message_completion(
+        self,
+        conversation_id: str,
+        message_id: str,
+        timeout: float = 300,
+        on_status: Optional[StatusCallback] = None,
+        **poll_options: float,
+    ) -> Dict[str, Any]:
+        """
+        Wait for a message to reach a terminal state (COMPLETED, ERROR, etc.).
+
+        on_status, if given, is called with (status, message) on every status
+        transition so callers can report progress.
+        """
+        message: Dict[str, Any] = {}
+        with metrics.span("genie.wait_for_message", message_id=message_id) as span:
+            for message in self.iter_message_status(conversation_id, message_id, timeout=timeout, **poll_options):
+                if on_status is not None:
+                    on_status(message.get("status"), message)
+            span.set(message_status=message.get("status"))
+        return message
 
     def get_space(self, space_id: str) -> dict:
         """Get details of a specific Genie space."""
         response = self.client.genie.get_space(space_id=space_id)
         return response.as_dict()
     
-def start_new_conversation(question: str, token: str, space_id: str) -> Tuple[str, Union[str, pd.DataFrame], Optional[str]]:
+class AsyncGenieClient:
+    """
+    Coroutine interface to the Genie API.
+
+    The Databricks SDK is synchronous, so each request runs on a thread of
+    executor while every wait between polls is an asyncio sleep: a thread is
+    held for one request at a time, never across a poll interval. Without an
+    executor, requests go to the shared pool from get_async_executor rather
+    than asyncio's small default executor.
+    """
+
+    def __init__(self, host: str, space_id: str, token: str, executor: Optional[concurrent.futures.Executor] = None):
+        self.sync_client = get_genie_client(host=host, space_id=space_id, token=token)
+        self.executor = executor or get_async_executor()
+
+    async def _call(self, function: Callable, *args):
+        """Run a blocking call on the executor, keeping the caller's metrics span"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, function, *args)
+        return await loop.run_in_executor(self.executor, call)
+
+    async def start_conversation(self, question: str) -> Dict[str, Any]:
+        """Start a new conversation with the given question"""
+        return await self._call(self.sync_client.start_conversation, question)
+
+    async def send_message(self, conversation_id: str, message: str) -> Dict[str, Any]:
+        """Send a follow-up message to an existing conversation"""
+        return await self._call(self.sync_client.send_message, conversation_id, message)
+
+    async def get_message(self, conversation_id: str, message_id: str) -> Dict[str, Any]:
+        """Get the details of a specific message"""
+        return await self._call(self.sync_client.get_message, conversation_id, message_id)
+
+    async def get_query_result(self, conversation_id: str, message_id: str, attachment_id: str) -> Dict[str, Any]:
+        """Get the query result using the attachment_id endpoint"""
+        return await self._call(self.sync_client.get_query_result, conversation_id, message_id, attachment_id)
+
+    async def process_response(self, conversation_id: str, message_id: str, complete_message: Dict[str, Any]) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
+        """process_genie_response for a completed message"""
+        return await self._call(process_genie_response, self.sync_client, conversation_id, message_id, complete_message)
+
+    async def wait_for_message_completion(
+        self,
+        conversation_id: str,
+        message_id: str,
+        timeout: float = 300,
+        on_status: Optional[StatusCallback] = None,
+        initial_poll_interval: float = 0.5,
+        max_poll_interval: float = 2.0,
+        backoff_factor: float = 2.0,
+        jitter: float = 0.2,
+        max_polls: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Wait for a message to reach a terminal state, polling on the same
+        schedule as GenieClient.iter_message_status.
+        """
+        schedule = _PollSchedule(timeout, initial_poll_interval, max_poll_interval, backoff_factor, jitter, max_polls)
+
+        while True:
+            message = await self.get_message(conversation_id, message_id)
+            status = message.get("status")
+
+            if schedule.observe(status) and on_status is not None:
+                on_status(status, message)
+
+            if status in TERMINAL_STATUSES:
+                return message
+
+            await asyncio.sleep(schedule.next_delay())
+
+
+def get_genie_client(host: str, space_id: str, token: str) -> GenieClient:
+    """Return the process-wide GenieClient for this host, token and space"""
+    key = (host, auth_identity(token), space_id)
+    return client_registry.get_or_create(
+        key, lambda: GenieClient(host=host, space_id=space_id, token=token)
+    )
+
+
+def start_new_conversation(question: str, token: str, space_id: str, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[str, Union[str, pd.DataFrame], Optional[str]]:
     """
     Start a new conversation with Genie.
     """
-    client = GenieClient(
+    conversation_id, result, query_text, _ = _start_conversation_turn(question, token, space_id, on_status=on_status, on_preview=on_preview)
+    return conversation_id, result, query_text
+
+
+def _start_conversation_turn(question: str, token: str, space_id: str, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[Optional[str], Union[str, pd.DataFrame], Optional[str], bool]:
+    """
+    start_new_conversation, also returning whether the result is a real answer
+    (the message COMPLETED with a text or query result) that may be cached.
+    """
+    client = get_genie_client(
         host=DATABRICKS_HOST,
         space_id=space_id,
         token=token
@@ -146,54 +532,213 @@ def start_new_conversation(question: str, token: str, space_id: str) -> Tuple[st
         message_id = response["message_id"]
         
         # Wait for the message to complete
-        complete_message = client.wait_for_message_completion(conversation_id, message_id)
+        complete_message = client.wait_for_message_completion(conversation_id, message_id, on_status=on_status)
         
         # Process the response
-        result, query_text = process_genie_response(client, conversation_id, message_id, complete_message)
+        result, query_text, answered = _read_genie_answer(client, conversation_id, message_id, complete_message, on_preview=on_preview)
+        cacheable = answered and complete_message.get("status") == "COMPLETED"
         
-        return conversation_id, result, query_text
+        return conversation_id, result, query_text, cacheable
         
     except Exception as e:
-        return None, f"Sorry, an error occurred: {str(e)}. Please try again.", None
+        return None, f"Sorry, an error occurred: {str(e)}. Please try again.", None, False
+
+def is_conversation_expired(error: Exception) -> bool:
+    """Whether an API error means the conversation no longer exists"""
+    message = str(error)
+    return "Conversation not found" in message or "RESOURCE_DOES_NOT_EXIST" in message
 
-def continue_conversation(conversation_id: str, question: str, token: str, space_id: str) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
+
+def _send_follow_up(client: GenieClient, conversation_id: str, question: str, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
+    """Send a follow-up message and wait for the answer; errors are raised to the caller"""
+    # Send follow-up message in existing conversation
+    response = client.send_message(conversation_id, question)
+    message_id = response["message_id"]
+    
+    # Wait for the message to complete
+    complete_message = client.wait_for_message_completion(conversation_id, message_id, on_status=on_status)
+    
+    # Process the response
+    return process_genie_response(client, conversation_id, message_id, complete_message, on_preview=on_preview)
+
+def continue_conversation(conversation_id: str, question: str, token: str, space_id: str, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
     """
     Send a follow-up message in an existing conversation.
     """
     logger.info(f"Continuing conversation {conversation_id} with question: {question[:30]}...")
-    client = GenieClient(
+    client = get_genie_client(
         host=DATABRICKS_HOST,
         space_id=space_id,
         token=token
     )
     
     try:
-        # Send follow-up message in existing conversation
-        response = client.send_message(conversation_id, question)
-        message_id = response["message_id"]
-        
-        # Wait for the message to complete
-        complete_message = client.wait_for_message_completion(conversation_id, message_id)
-        
-        # Process the response
-        result, query_text = process_genie_response(client, conversation_id, message_id, complete_message)
-        
-        return result, query_text
+        return _send_follow_up(client, conversation_id, question, on_status=on_status, on_preview=on_preview)
         
     except Exception as e:
         # Handle specific errors
         if "429" in str(e) or "Too Many Requests" in str(e):
             return "Sorry, the system is currently experiencing high demand. Please try again in a few moments.", None
-        elif "Conversation not found" in str(e):
+        elif is_conversation_expired(e):
             return "Sorry, the previous conversation has expired. Please try your query again to start a new conversation.", None
         else:
             logger.error(f"Error continuing conversation: {str(e)}")
             return f"Sorry, an error occurred: {str(e)}", None
 
-def process_genie_response(client, conversation_id, message_id, complete_message) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
+# Genie result column types (manifest type_name) grouped by the dtype they decode to
+INTEGER_TYPES = {"BYTE", "SHORT", "INT", "LONG"}
+FLOAT_TYPES = {"FLOAT", "DOUBLE"}
+TIMESTAMP_TYPES = {"TIMESTAMP", "TIMESTAMP_NTZ"}
+
+DECIMAL_TYPE_TEXT = re.compile(r"DECIMAL\((\d+)\s*,\s*(\d+)\)", re.IGNORECASE)
+
+
+def _decimal_precision(column: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """(precision, scale) of a DECIMAL column from its manifest entry, None if not stated"""
+    precision, scale = column.get("type_precision"), column.get("type_scale")
+    if precision is None:
+        match = DECIMAL_TYPE_TEXT.search(column.get("type_text") or "")
+        if match is None:
+            return None
+        precision, scale = match.groups()
+    return int(precision), int(scale or 0)
+
+
+def _pyarrow():
+    """
+    pyarrow, imported on first decode rather than at app start (it takes
+    longer to import than the rest of this module); None when it is missing,
+    in which case results are parsed with pandas.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        # pyarrow ships with databricks-sql-connector
+        return None
+    return pyarrow
+
+
+def _cast_arrow_column(pa, values: "pa.Array", type_name: str, column: Dict[str, Any]) -> "pa.Array":
+    """Cast a string column to the Arrow type matching its Genie type name"""
+    if type_name in INTEGER_TYPES:
+        return values.cast(pa.int64())
+    if type_name in FLOAT_TYPES:
+        return values.cast(pa.float64())
+    if type_name == "DECIMAL":
+        # Exact decimals (object column of decimal.Decimal); never rounded through float64
+        precision = _decimal_precision(column)
+        if precision is None:
+            return values
+        return values.cast(pa.decimal128(*precision) if precision[0] <= 38 else pa.decimal256(*precision))
+    if type_name == "BOOLEAN":
+        return values.cast(pa.bool_())
+    if type_name == "DATE":
+        return values.cast(pa.date32())
+    if type_name == "TIMESTAMP":
+        return values.cast(pa.timestamp("us", tz="UTC"))
+    if type_name == "TIMESTAMP_NTZ":
+        return values.cast(pa.timestamp("us"))
+    return values
+
+
+def _parse_decimal(value: Optional[str]) -> Optional[decimal.Decimal]:
+    try:
+        return decimal.Decimal(value) if value is not None else None
+    except decimal.InvalidOperation:
+        return None
+
+
+def _convert_pandas_column(values: pd.Series, type_name: str) -> pd.Series:
+    """Parse a string column with pandas; used when Arrow is missing or rejects the values"""
+    if type_name in INTEGER_TYPES:
+        return pd.to_numeric(values, errors="coerce").astype("Int64")
+    if type_name in FLOAT_TYPES:
+        return pd.to_numeric(values, errors="coerce").astype("float64")
+    if type_name == "DECIMAL":
+        return values.map(_parse_decimal, na_action="ignore").astype(object)
+    if type_name == "BOOLEAN":
+        return values.str.lower().map({"true": True, "false": False}).astype("boolean")
+    if type_name == "DATE" or type_name in TIMESTAMP_TYPES:
+        return pd.to_datetime(values, errors="coerce", format="ISO8601", utc=type_name == "TIMESTAMP")
+    return values
+
+
+def _arrow_string_columns(pa, data_array: List[List[Optional[str]]], width: int) -> List["pa.Array"]:
+    """
+    Split row-major string values into one Arrow array per column.
+
+    The rows are converted once into an Arrow list array and each column is
+    taken out of its flattened values by stride, which avoids transposing the
+    rows in Python; rows of unequal length fall back to the transpose.
+    """
+    values = pa.array(data_array, type=pa.list_(pa.string())).flatten()
+    if len(values) != len(data_array) * width:
+        return [pa.array(column, type=pa.string()) for column in itertools.zip_longest(*data_array)][:width]
+    return [values.take(np.arange(i, len(values), width)) for i in range(width)]
+
+
+def decode_query_result(data_array: List[List[Optional[str]]], schema: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Build a typed DataFrame from a Genie data_array and its manifest schema.
+
+    Genie returns every value as a string. Columns are decoded in one pass per
+    column using the schema type names: integers become nullable Int64,
+    floats float64, decimals exact decimal.Decimal values (using the
+    manifest's precision and scale), booleans nullable boolean and dates and
+    timestamps datetime64. Arrow does the parsing when it is available.
+    """
+    schema_columns = schema.get("columns", [])
+    width = len(schema_columns) or (len(data_array[0]) if data_array else 0)
+    names = [col.get("name") for col in schema_columns] or [f"column_{i}" for i in range(width)]
+    type_names = [(col.get("type_name") or "STRING").upper() for col in schema_columns] or ["STRING"] * width
+    columns = schema_columns or [{}] * width
+
+    pa = _pyarrow()
+    if pa is None:
+        column_values = list(itertools.zip_longest(*data_array))[:width] if data_array else [()] * width
+        df = pd.DataFrame({i: pd.Series(values, dtype=object) for i, values in enumerate(column_values)})
+        for i, type_name in enumerate(type_names):
+            df[i] = _convert_pandas_column(df[i], type_name)
+        df.columns = names
+        return df
+
+    strings = _arrow_string_columns(pa, data_array, width) if data_array else [pa.array([], type=pa.string())] * width
+    arrays = []
+    unparsed = []
+    for i, (type_name, column, values) in enumerate(zip(type_names, columns, strings)):
+        try:
+            arrays.append(_cast_arrow_column(pa, values, type_name, column))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            arrays.append(values)
+            unparsed.append(i)
+
+    table = pa.Table.from_arrays(arrays, names=[str(i) for i in range(width)])
+    df = table.to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}.get,
+        date_as_object=False,
+        self_destruct=True,
+    )
+    for i in unparsed:
+        df[str(i)] = _convert_pandas_column(df[str(i)], type_names[i])
+    df.columns = names
+    return df
+
+
+def process_genie_response(client, conversation_id, message_id, complete_message, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[Union[str, pd.DataFrame], Optional[str]]:
     """
     Process the response from Genie
+
+    For results split across several chunks, on_preview is called with the
+    rows of the first chunk while the rest is loading. A result that hit the
+    memory cap has df.attrs["truncated"] set, with the full row count in
+    df.attrs["total_row_count"].
     """
+    result, query_text, _ = _read_genie_answer(client, conversation_id, message_id, complete_message, on_preview=on_preview)
+    return result, query_text
+
+
+def _read_genie_answer(client, conversation_id, message_id, complete_message, on_preview: Optional[Callable[[pd.DataFrame], None]] = None) -> Tuple[Union[str, pd.DataFrame], Optional[str], bool]:
+    """process_genie_response, also returning whether the result came from a text or query attachment"""
     # Check attachments first
     attachments = complete_message.get("attachments", [])
     for attachment in attachments:
@@ -201,42 +746,299 @@ def process_genie_response(client, conversation_id, message_id, complete_message
         
         # If there's text content in the attachment, return it
         if "text" in attachment and "content" in attachment["text"]:
-            return attachment["text"]["content"], None
+            return attachment["text"]["content"], None, True
         
         # If there's a query, get the result
         elif "query" in attachment:
             query_text = attachment.get("query", {}).get("query", "")
-            query_result = client.get_query_result(conversation_id, message_id, attachment_id)
+            on_first_chunk = None
+            if on_preview is not None:
+                def on_first_chunk(chunk):
+                    on_preview(decode_query_result(chunk['data_array'], chunk['schema']))
+            query_result = client.get_query_result(conversation_id, message_id, attachment_id, on_first_chunk=on_first_chunk)
            
             data_array = query_result.get('data_array', [])
             schema = query_result.get('schema', {})
-            columns = [col.get('name') for col in schema.get('columns', [])]
             
-            # If we have data, return as DataFrame
+            # If we have data, return as a typed DataFrame
             if data_array:
-                # If no columns from schema, create generic ones
-                if not columns and data_array and len(data_array) > 0:
-                    columns = [f"column_{i}" for i in range(len(data_array[0]))]
-                
-                df = pd.DataFrame(data_array, columns=columns)
-                return df, query_text
+                df = decode_query_result(data_array, schema)
+                df.attrs["truncated"] = query_result.get('truncated', False)
+                df.attrs["total_row_count"] = query_result.get('total_row_count')
+                return df, query_text, True
     
     # If no attachments or no data in attachments, return text content
+    # (for a failed message this is the question itself, so it is not an answer)
     if 'content' in complete_message:
-        return complete_message.get('content', ''), None
+        return complete_message.get('content', ''), None, False
     
-    return "No response available", None
+    return "No response available", None, False
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache entry"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
 
-def genie_query(question: str, token: str, space_id: str) -> Union[Tuple[str, Optional[str]], Tuple[pd.DataFrame, str]]:
+def _answer_size(answer: Tuple[Union[str, pd.DataFrame], Optional[str]]) -> int:
+    result, query_text = answer
+    size = len(query_text or "")
+    if isinstance(result, pd.DataFrame):
+        return size + int(result.memory_usage(deep=True).sum())
+    return size + len(result)
+
+
+class AnswerCache:
+    """
+    Cache of Genie answers keyed by (space_id, normalized question).
+
+    Answers live in an in-memory TTL/LRU tier bounded by entry count and total
+    DataFrame bytes. When a directory is given, answers are also written there
+    (tables as Parquet, text as JSON) so they survive app restarts.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_bytes: int, directory: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.memory = TTLCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, max_bytes=max_bytes, sizeof=_answer_size
+        )
+
+    def get(self, space_id: str, question: str) -> Optional[Tuple[Union[str, pd.DataFrame], Optional[str]]]:
+        key = (space_id, normalize_question(question))
+        answer = self.memory.get(key)
+        if answer is None and self.directory:
+            answer = self._read_disk(*key)
+            if answer is not None:
+                self.memory.set(key, answer)
+        if answer is None:
+            return None
+        result, query_text = answer
+        # Shallow copy so callers cannot rename or add columns on the shared frame
+        if isinstance(result, pd.DataFrame):
+            result = result.copy(deep=False)
+        return result, query_text
+
+    def set(self, space_id: str, question: str, result: Union[str, pd.DataFrame], query_text: Optional[str]):
+        key = (space_id, normalize_question(question))
+        self.memory.set(key, (result, query_text))
+        if self.directory:
+            try:
+                self._write_disk(*key, result, query_text)
+            except Exception as e:
+                logger.warning(f"Could not persist cached Genie answer: {str(e)}")
+
+    def invalidate_space(self, space_id: str) -> int:
+        """Drop every cached answer for a Genie space"""
+        removed = self.memory.invalidate(lambda key: key[0] == space_id)
+        if self.directory:
+            shutil.rmtree(self._space_dir(space_id), ignore_errors=True)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return self.memory.stats()
+
+    def _space_dir(self, space_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_-]", "_", space_id))
+
+    def _entry_path(self, space_id: str, normalized: str) -> str:
+        return os.path.join(self._space_dir(space_id), hashlib.sha256(normalized.encode()).hexdigest())
+
+    def _read_disk(self, space_id: str, normalized: str) -> Optional[Tuple[Union[str, pd.DataFrame], Optional[str]]]:
+        path = self._entry_path(space_id, normalized)
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            if time.time() - meta["created_at"] > self.ttl_seconds:
+                return None
+            if meta["kind"] == "table":
+                # pandas imports pyarrow for Parquet here, on the first disk hit
+                return pd.read_parquet(path + ".parquet"), meta["query_text"]
+            return meta["text"], meta["query_text"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cached Genie answer {path}: {str(e)}")
+            return None
+
+    def _write_disk(self, space_id: str, normalized: str, result: Union[str, pd.DataFrame], query_text: Optional[str]):
+        path = self._entry_path(space_id, normalized)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"created_at": time.time(), "question": normalized, "query_text": query_text}
+        if isinstance(result, pd.DataFrame):
+            result.to_parquet(path + ".parquet.tmp")
+            os.replace(path + ".parquet.tmp", path + ".parquet")
+            meta["kind"] = "table"
+        else:
+            meta["kind"] = "text"
+            meta["text"] = result
+        # The metadata file is written last so a reader never sees a half-written entry
+        with open(path + ".json.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".json.tmp", path + ".json")
+
+
+answer_cache = AnswerCache(
+    ttl_seconds=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+    directory=ANSWER_CACHE_DIR,
+)
+metrics.register_gauge("answer_cache", answer_cache.stats)
+
+
+def genie_query(question: str, token: str, space_id: str, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None, use_cache: bool = True) -> Union[Tuple[str, Optional[str]], Tuple[pd.DataFrame, str]]:
     """
     Main entry point for querying Genie.
+
+    Answers are served from answer_cache when the same question was asked in
+    the same space recently. on_status is called with (status, message) on
+    every Genie status transition; on_preview with the first rows of a large
+    result while the rest loads.
     """
     try:
+        if use_cache:
+            cached = answer_cache.get(space_id, question)
+            if cached is not None:
+                logger.info(f"Answer cache hit for question: {question[:30]}...")
+                return cached
+
         # Start a new conversation for each query
-        conversation_id, result, query_text = start_new_conversation(question, token, space_id)
+        conversation_id, result, query_text, cacheable = _start_conversation_turn(question, token, space_id, on_status=on_status, on_preview=on_preview)
+
+        # Only answers of COMPLETED messages are cached, never error or echoed text
+        if use_cache and cacheable:
+            answer_cache.set(space_id, question, result, query_text)
         return result, query_text
             
     except Exception as e:
         logger.error(f"Error in conversation: {str(e)}. Please try again.")
         return f"Sorry, an error occurred: {str(e)}. Please try again.", None
 
+
+def record_turn_latency(kind: str, seconds: float, retries: int = 0):
+    metrics.record(f"genie.turn.{kind}", seconds, retries=retries)
+
+
+def get_turn_latency_stats() -> Dict[str, Dict[str, float]]:
+    """Count, mean, p50, p95 and p99 latency (seconds) of recent first, follow-up and cached chat turns"""
+    summary = metrics.summary()
+    return {kind: summary.get(f"genie.turn.{kind}", {"count": 0}) for kind in ("first", "follow_up", "cached")}
+
+
+def genie_chat(question: str, token: str, space_id: str, conversation_id: Optional[str] = None, on_status: Optional[StatusCallback] = None, on_preview: Optional[Callable[[pd.DataFrame], None]] = None, context_question: Optional[str] = None) -> Tuple[Optional[str], Union[str, pd.DataFrame], Optional[str]]:
+    """
+    Ask a question as part of a chat session.
+
+    With a conversation_id the question is sent as a follow-up so Genie keeps
+    the context; if Genie reports the conversation expired, a new conversation
+    is started instead. Returns (conversation_id, result, query_text), where
+    conversation_id is the one to pass with the next question.
+
+    An opening question found in answer_cache is answered from it: on_status
+    is called with "CACHED" and no conversation is opened, so conversation_id
+    comes back None. Pass that question as context_question with the next
+    turn; the conversation is then opened with it before the follow-up is
+    sent, so Genie still has the context.
+    """
+    started = time.monotonic()
+    kind = "follow_up" if conversation_id or context_question else "first"
+    retries = 0
+    try:
+        if conversation_id is None and context_question is None:
+            cached = answer_cache.get(space_id, question)
+            if cached is not None:
+                logger.info(f"Answer cache hit for question: {question[:30]}...")
+                if on_status is not None:
+                    on_status("CACHED", {"status": "CACHED", "content": question})
+                record_turn_latency("cached", time.monotonic() - started)
+                return None, cached[0], cached[1]
+
+        if conversation_id is None and context_question is not None:
+            # The previous turn came from answer_cache, so no conversation holds its context yet
+            conversation_id, result, query_text, cacheable = _start_conversation_turn(context_question, token, space_id, on_status=on_status)
+            if cacheable:
+                answer_cache.set(space_id, context_question, result, query_text)
+
+        if conversation_id is not None:
+            client = get_genie_client(host=DATABRICKS_HOST, space_id=space_id, token=token)
+            try:
+                result, query_text = _send_follow_up(client, conversation_id, question, on_status=on_status, on_preview=on_preview)
+                record_turn_latency(kind, time.monotonic() - started)
+                return conversation_id, result, query_text
+            except Exception as e:
+                if not is_conversation_expired(e):
+                    raise
+                logger.info(f"Conversation {conversation_id} expired; starting a new conversation")
+                conversation_id = None
+                kind = "first"
+                retries += 1
+
+        conversation_id, result, query_text, cacheable = _start_conversation_turn(question, token, space_id, on_status=on_status, on_preview=on_preview)
+        # A follow-up replayed after the expiry fallback (or without its context
+        # question) depends on lost context, so its answer is not a standalone
+        # answer to the question text
+        if cacheable and retries == 0 and context_question is None:
+            answer_cache.set(space_id, question, result, query_text)
+        if conversation_id is not None:
+            record_turn_latency(kind, time.monotonic() - started, retries)
+        return conversation_id, result, query_text
+
+    except Exception as e:
+        logger.error(f"Error in conversation: {str(e)}")
+        if "429" in str(e) or "Too Many Requests" in str(e):
+            return conversation_id, "Sorry, the system is currently experiencing high demand. Please try again in a few moments.", None
+        return conversation_id, f"Sorry, an error occurred: {str(e)}. Please try again.", None
+
+
+async def genie_query_async(question: str, token: str, space_id: str, on_status: Optional[StatusCallback] = None, executor: Optional[concurrent.futures.Executor] = None) -> Union[Tuple[str, Optional[str]], Tuple[pd.DataFrame, str]]:
+    """
+    Coroutine equivalent of genie_query; requests run on executor (see AsyncGenieClient).
+    """
+    client = AsyncGenieClient(host=DATABRICKS_HOST, space_id=space_id, token=token, executor=executor)
+
+    try:
+        response = await client.start_conversation(question)
+        conversation_id = response["conversation_id"]
+        message_id = response["message_id"]
+
+        complete_message = await client.wait_for_message_completion(conversation_id, message_id, on_status=on_status)
+
+        return await client.process_response(conversation_id, message_id, complete_message)
+
+    except Exception as e:
+        logger.error(f"Error in conversation: {str(e)}. Please try again.")
+        return f"Sorry, an error occurred: {str(e)}. Please try again.", None
+
+
+async def genie_query_many(questions: List[str], token: str, space_id: str, max_concurrency: int = 10) -> List[Union[Tuple[str, Optional[str]], Tuple[pd.DataFrame, str]]]:
+    """
+    Ask several independent questions concurrently.
+
+    Results are returned in the same order as the questions; at most
+    max_concurrency conversations are in flight at once, and their requests
+    run on a pool of max_concurrency threads of their own.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="genie-async") as executor:
+        async def ask(question: str):
+            async with semaphore:
+                return await genie_query_async(question, token, space_id, executor=executor)
+
+        return await asyncio.gather(*(ask(question) for question in questions))
+
+
+_async_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_async_executor_lock = threading.Lock()
+
+
+def get_async_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Return the process-wide pool running AsyncGenieClient requests (GENIE_ASYNC_WORKERS threads)"""
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=ASYNC_WORKERS, thread_name_prefix="genie-async"
+            )
+        return _async_executor
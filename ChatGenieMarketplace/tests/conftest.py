@@ -0,0 +1,45 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_genie import FakeGenieServer, VirtualClock, load_genie_room  # noqa: E402
+
+# Importing genie_room also puts AppFrontEnd on sys.path for the cache, metrics and data tests
+load_genie_room()
+
+
+@pytest.fixture
+def genie_room():
+    return load_genie_room()
+
+
+@pytest.fixture
+def clock(genie_room, monkeypatch):
+    """Virtual clock driving genie_room's sleeps and deadlines"""
+    clock = VirtualClock()
+    monkeypatch.setattr(genie_room, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_server(genie_room, clock, monkeypatch):
+    """Factory for a FakeGenieServer on the virtual clock that genie_room talks to"""
+
+    def make(**options):
+        server = FakeGenieServer(clock=clock, **options)
+        monkeypatch.setattr(genie_room, "WorkspaceClient", server.workspace_client)
+        return server
+
+    return make
+
+
+@pytest.fixture
+def space_id():
+    """A Genie space of its own, so answer_cache entries never leak between tests"""
+    return f"space-{uuid.uuid4().hex}"
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+import cache
+from cache import ReferenceDataset, TTLCache
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_evicts_least_recently_used_beyond_max_entries():
+    entries = TTLCache(max_entries=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1 and entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_evicts_by_total_size():
+    entries = TTLCache(max_entries=10, max_bytes=10, sizeof=len)
+    entries.set("a", "xxxx")
+    entries.set("b", "xxxx")
+    entries.set("c", "xxxx")
+
+    assert "a" not in entries._entries
+    assert entries.stats()["bytes"] == 8
+
+
+def test_skips_values_larger_than_the_whole_cache():
+    entries = TTLCache(max_bytes=10, sizeof=len)
+    entries.set("small", "x")
+    entries.set("huge", "x" * 11)
+
+    assert entries.get("huge") is None
+    assert entries.get("small") == "x"
+
+
+def test_replacing_a_key_keeps_the_size_accounting():
+    entries = TTLCache(max_bytes=100, sizeof=len)
+    entries.set("a", "x" * 10)
+    entries.set("a", "x" * 3)
+
+    assert entries.stats()["bytes"] == 3
+    assert len(entries) == 1
+
+
+def test_entries_expire_after_their_ttl(monotonic):
+    entries = TTLCache(ttl_seconds=60)
+    entries.set("a", 1)
+    entries.set("b", 2, ttl_seconds=600)
+    monotonic.now += 61
+
+    assert entries.get("a") is None
+    assert entries.get("b") == 2
+    assert entries.stats()["hits"] == 1 and entries.stats()["misses"] == 1
+
+
+def test_invalidate_by_predicate():
+    entries = TTLCache()
+    entries.set(("cost", 1), 1)
+    entries.set(("cost", 2), 2)
+    entries.set(("time", 1), 3)
+
+    assert entries.invalidate(lambda key: key[0] == "cost") == 2
+    assert len(entries) == 1
+    assert entries.invalidate() == 1
+
+
+def test_reference_dataset_loads_once_and_partitions_by_column():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return pd.DataFrame({"formation": ["A", "B", "A"], "value": [1, 2, 3]})
+
+    dataset = ReferenceDataset("jobs", loader, "formation", ttl_seconds=600)
+
+    assert dataset.partition("A")["value"].tolist() == [1, 3]
+    assert dataset.partition("missing").empty
+    assert len(dataset.get()) == 3
+    assert len(loads) == 1
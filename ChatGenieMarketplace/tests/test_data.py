@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+import data
+
+
+def test_group_by_columns_batches_rows_with_the_same_edited_columns():
+    groups = data._group_by_columns(
+        [
+            (1, {"review_stamp": "ok", "formation": "A"}),
+            (2, {"formation": "B", "review_stamp": "redo"}),
+            (3, {"geo_risk_index": 0.4}),
+        ]
+    )
+
+    assert groups == {
+        ("formation", "review_stamp"): [(1, ["A", "ok"]), (2, ["B", "redo"])],
+        ("geo_risk_index",): [(3, [0.4])],
+    }
+
+
+def test_column_identifiers_reject_unknown_columns():
+    pytest.importorskip("psycopg2")
+
+    with pytest.raises(ValueError, match="id"):
+        data._column_identifiers(["formation", "id"])
+
+
+def test_filtered_job_data_does_not_share_the_cached_frame(monkeypatch):
+    loads = []
+
+    def loader(formation=None):
+        loads.append(formation)
+        return pd.DataFrame({"PRODUCING_FORMATION": [formation] * 2, "DEPTH": [1, 2]})
+
+    monkeypatch.setattr(data, "syched_job_data", loader)
+    monkeypatch.setattr(data, "_formation_datasets", {})
+
+    first = data.filtered_job_data("A")
+    first["DEPTH"] = first["DEPTH"] * 100
+    first["EXTRA"] = 1
+
+    second = data.filtered_job_data("A")
+    assert second["DEPTH"].tolist() == [1, 2]
+    assert "EXTRA" not in second
+    assert loads == ["A"]
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+SCHEMA = {
+    "columns": [
+        {"name": "job_id", "type_name": "LONG"},
+        {"name": "depth_ft", "type_name": "DOUBLE"},
+        {"name": "well", "type_name": "STRING"},
+        {"name": "completed", "type_name": "BOOLEAN"},
+        {"name": "spud_date", "type_name": "DATE"},
+        {"name": "updated_at", "type_name": "TIMESTAMP"},
+    ]
+}
+
+ROWS = [
+    ["1", "1500.5", "WELL-1", "true", "2024-01-02", "2024-01-02T10:00:00.000Z"],
+    [None, None, None, None, None, None],
+    ["3", "9000", "WELL-3", "FALSE", "2024-03-04", "2024-03-04T12:30:00.000Z"],
+]
+
+
+@pytest.fixture(params=["arrow", "pandas"])
+def decode(request, genie_room, monkeypatch):
+    if request.param == "arrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(genie_room, "_pyarrow", lambda: None)
+    return genie_room.decode_query_result
+
+
+def test_types_follow_the_schema(decode):
+    df = decode(ROWS, SCHEMA)
+
+    assert list(df.columns) == [column["name"] for column in SCHEMA["columns"]]
+    assert df["job_id"].dtype == "Int64"
+    assert df["depth_ft"].dtype == "float64"
+    assert df["completed"].dtype == "boolean"
+    assert pd.api.types.is_datetime64_any_dtype(df["spud_date"])
+    assert str(df["updated_at"].dt.tz) == "UTC"
+    assert df["job_id"].tolist()[::2] == [1, 3]
+    assert df["completed"].tolist()[::2] == [True, False]
+    assert df.iloc[1].isna().all()
+
+
+def test_unparseable_integers_become_missing(decode):
+    df = decode([["1"], ["n/a"]], {"columns": [{"name": "job_id", "type_name": "INT"}]})
+
+    assert df["job_id"].dtype == "Int64"
+    assert df["job_id"].isna().tolist() == [False, True]
+
+
+def test_columns_without_a_schema_get_generic_names(decode):
+    df = decode([["a", "b"]], {})
+
+    assert list(df.columns) == ["column_0", "column_1"]
+
+
+def test_empty_result_keeps_the_schema_columns(decode):
+    df = decode([], SCHEMA)
+
+    assert df.empty
+    assert list(df.columns) == [column["name"] for column in SCHEMA["columns"]]
+
+
+def test_decimals_keep_their_exact_value(decode):
+    columns = [
+        {"name": "cost_usd", "type_name": "DECIMAL", "type_precision": 18, "type_scale": 2},
+        {"name": "rate", "type_name": "DECIMAL", "type_text": "decimal(10,4)"},
+    ]
+
+    df = decode([["12345678901234.57", "0.1234"], [None, None]], {"columns": columns})
+
+    assert df["cost_usd"].tolist()[0] == Decimal("12345678901234.57")
+    assert df["rate"].tolist()[0] == Decimal("0.1234")
+    assert df.iloc[1].isna().all()
+
+
+def test_rows_of_unequal_length_still_decode(decode):
+    df = decode([["1", "a"], ["2"]], {})
+
+    assert df["column_0"].tolist() == ["1", "2"]
+    assert df["column_1"].isna().tolist() == [False, True]
@@ -0,0 +1,90 @@
+import pandas as pd
+
+
+def test_normalize_question_ignores_case_spacing_and_trailing_punctuation(genie_room):
+    assert genie_room.normalize_question("  How many   WELLS?! ") == genie_room.normalize_question("how many wells")
+
+
+def test_answer_cache_is_keyed_by_space(genie_room, space_id):
+    genie_room.answer_cache.set(space_id, "How many wells?", "42", None)
+
+    assert genie_room.answer_cache.get(space_id, "how many wells") == ("42", None)
+    assert genie_room.answer_cache.get(f"{space_id}-other", "how many wells") is None
+
+
+def test_first_turn_opens_a_conversation_and_caches_the_answer(genie_room, make_server, space_id):
+    server = make_server()
+
+    conversation_id, result, query_text = genie_room.genie_chat("How many wells?", server.token, space_id)
+
+    assert conversation_id is not None
+    assert isinstance(result, pd.DataFrame) and len(result) == server.rows_per_answer
+    assert query_text
+    assert genie_room.answer_cache.get(space_id, "How many wells?") is not None
+
+
+def test_repeated_opening_question_is_answered_from_the_cache(genie_room, make_server, space_id):
+    server = make_server()
+    genie_room.genie_chat("How many wells?", server.token, space_id)
+    seen = []
+
+    conversation_id, result, _ = genie_room.genie_chat(
+        "how many wells", server.token, space_id, on_status=lambda status, message: seen.append(status)
+    )
+
+    assert conversation_id is None
+    assert isinstance(result, pd.DataFrame)
+    assert seen == ["CACHED"]
+    assert server.requests["start_conversation"] == 1
+
+
+def test_follow_up_to_a_cached_answer_opens_the_conversation_with_its_question(genie_room, make_server, space_id):
+    server = make_server()
+    genie_room.answer_cache.set(space_id, "How many wells?", "42", None)
+
+    conversation_id, _, _ = genie_room.genie_chat(
+        "And by field?", server.token, space_id, context_question="How many wells?"
+    )
+
+    assert conversation_id is not None
+    contents = [message["content"] for message in server.messages.values()]
+    assert contents == ["How many wells?", "And by field?"]
+    assert server.requests["send_message"] == 1
+    # The follow-up only makes sense after its context question
+    assert genie_room.answer_cache.get(space_id, "And by field?") is None
+
+
+def test_follow_up_continues_the_conversation_without_reading_the_cache(genie_room, make_server, space_id):
+    server = make_server()
+    conversation_id, _, _ = genie_room.genie_chat("How many wells?", server.token, space_id)
+    genie_room.answer_cache.set(space_id, "And by field?", "cached", None)
+
+    next_id, result, _ = genie_room.genie_chat("And by field?", server.token, space_id, conversation_id=conversation_id)
+
+    assert next_id == conversation_id
+    assert isinstance(result, pd.DataFrame)
+    assert server.requests["send_message"] == 1
+
+
+def test_expired_conversation_falls_back_to_a_new_one_without_caching(genie_room, make_server, space_id):
+    server = make_server()
+    conversation_id, _, _ = genie_room.genie_chat("How many wells?", server.token, space_id)
+    server.expire_conversation(conversation_id)
+
+    next_id, result, _ = genie_room.genie_chat("And by field?", server.token, space_id, conversation_id=conversation_id)
+
+    assert next_id not in (None, conversation_id)
+    assert isinstance(result, pd.DataFrame)
+    assert server.requests["start_conversation"] == 2
+    assert genie_room.answer_cache.get(space_id, "And by field?") is None
+
+
+def test_failed_answers_are_not_cached(genie_room, make_server, space_id):
+    server = make_server(final_status="FAILED")
+
+    genie_room.genie_chat("How many wells?", server.token, space_id)
+    result, _ = genie_room.genie_query("How many wells?", server.token, space_id)
+
+    assert isinstance(result, str)
+    assert genie_room.answer_cache.get(space_id, "How many wells?") is None
+    assert server.requests["start_conversation"] == 2
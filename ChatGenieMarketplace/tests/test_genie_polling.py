@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from fake_genie import DEFAULT_STAGES
+
+TIMELINE_ORDER = [status for status, _ in DEFAULT_STAGES] + ["COMPLETED"]
+
+
+def ask(genie_room, server, question="How many wells?"):
+    client = genie_room.get_genie_client(host=genie_room.DATABRICKS_HOST, space_id="space", token=server.token)
+    response = client.start_conversation(question)
+    return client, response["conversation_id"], response["message_id"]
+
+
+def test_waits_until_completed_and_notices_it_promptly(genie_room, clock, make_server):
+    server = make_server(seed=1)
+    client, conversation_id, message_id = ask(genie_room, server)
+
+    message = client.wait_for_message_completion(conversation_id, message_id)
+
+    assert message["status"] == "COMPLETED"
+    completed_at = server.messages[message_id]["completed_at"]
+    # Never later than one EXECUTING_QUERY cap plus the request itself
+    assert completed_at <= clock.now <= completed_at + genie_room.STATUS_MAX_POLL_INTERVAL["EXECUTING_QUERY"] + server.request_latency
+
+
+def test_yields_each_status_change_once_in_order(genie_room, make_server):
+    server = make_server(seed=2)
+    client, conversation_id, message_id = ask(genie_room, server)
+
+    statuses = [message["status"] for message in client.iter_message_status(conversation_id, message_id)]
+
+    assert statuses[-1] == "COMPLETED"
+    assert len(statuses) == len(set(statuses))
+    assert statuses == sorted(statuses, key=TIMELINE_ORDER.index)
+
+
+def test_on_status_reports_transitions(genie_room, make_server):
+    server = make_server(seed=3)
+    client, conversation_id, message_id = ask(genie_room, server)
+    seen = []
+
+    client.wait_for_message_completion(conversation_id, message_id, on_status=lambda status, message: seen.append(status))
+
+    assert seen[0] == "SUBMITTED"
+    assert seen[-1] == "COMPLETED"
+
+
+def test_failed_message_ends_polling(genie_room, make_server):
+    server = make_server(final_status="FAILED")
+    client, conversation_id, message_id = ask(genie_room, server)
+
+    assert client.wait_for_message_completion(conversation_id, message_id)["status"] == "FAILED"
+
+
+def test_never_polls_more_than_the_fixed_interval_loop_would(genie_room, make_server):
+    server = make_server(stages=[("ASKING_AI", (1000.0, 1000.0))])
+    client, conversation_id, message_id = ask(genie_room, server)
+
+    with pytest.raises(TimeoutError):
+        client.wait_for_message_completion(conversation_id, message_id, timeout=60)
+
+    assert server.messages[message_id]["requests"] <= 60 // genie_room.LEGACY_POLL_INTERVAL + 1
+
+
+def test_max_polls_caps_requests(genie_room, make_server):
+    server = make_server(stages=[("ASKING_AI", (1000.0, 1000.0))])
+    client, conversation_id, message_id = ask(genie_room, server)
+
+    with pytest.raises(TimeoutError):
+        client.wait_for_message_completion(conversation_id, message_id, max_polls=3)
+
+    assert server.messages[message_id]["requests"] == 3
+
+
+def test_interval_backs_off_across_statuses_and_restarts_for_the_query(genie_room, clock):
+    schedule = genie_room._PollSchedule(initial_poll_interval=0.5, max_poll_interval=2.0, backoff_factor=2.0, jitter=0)
+    delays = []
+    for status in ["SUBMITTED", "SUBMITTED", "FETCHING_METADATA", "ASKING_AI", "EXECUTING_QUERY", "EXECUTING_QUERY", "EXECUTING_QUERY"]:
+        schedule.observe(status)
+        delays.append(schedule.next_delay())
+
+    assert delays == [0.5, 1.0, 2.0, 2.0, 0.5, 1.0, 1.0]
+
+
+def test_async_waiter_follows_the_same_schedule(genie_room, clock, make_server, monkeypatch):
+    async def sleep(seconds):
+        clock.sleep(seconds)
+
+    monkeypatch.setattr(genie_room.asyncio, "sleep", sleep)
+    server = make_server(seed=4, request_latency=0.0)
+    client = genie_room.AsyncGenieClient(host=genie_room.DATABRICKS_HOST, space_id="space", token=server.token)
+    seen = []
+
+    async def run():
+        response = await client.start_conversation("How many wells?")
+        return response["message_id"], await client.wait_for_message_completion(
+            response["conversation_id"], response["message_id"], on_status=lambda status, message: seen.append(status)
+        )
+
+    message_id, message = asyncio.run(run())
+
+    assert message["status"] == "COMPLETED"
+    assert seen == sorted(set(seen), key=TIMELINE_ORDER.index)
+    assert clock.now - server.messages[message_id]["completed_at"] <= genie_room.STATUS_MAX_POLL_INTERVAL["EXECUTING_QUERY"]
+
+
+def test_genie_query_many_answers_every_question(genie_room, clock, make_server, space_id, monkeypatch):
+    async def sleep(seconds):
+        clock.sleep(seconds)
+
+    monkeypatch.setattr(genie_room.asyncio, "sleep", sleep)
+    server = make_server(request_latency=0.0, rows_per_answer=3)
+    questions = [f"question {i}" for i in range(5)]
+
+    results = asyncio.run(genie_room.genie_query_many(questions, server.token, space_id, max_concurrency=2))
+
+    assert [len(result) for result, _ in results] == [3] * 5
+    answered = {message["content"] for message in server.messages.values()}
+    assert answered == set(questions)
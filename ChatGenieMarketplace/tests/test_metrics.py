@@ -0,0 +1,87 @@
+import pytest
+
+from metrics import MetricsRegistry, describe_statement
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(max_samples=100, max_spans=100)
+
+
+def test_span_records_latency_and_errors(registry):
+    with registry.span("lakebase.execute"):
+        pass
+    with pytest.raises(ValueError):
+        with registry.span("lakebase.execute"):
+            raise ValueError("boom")
+
+    stats = registry.summary()["lakebase.execute"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+    assert stats["p50"] <= stats["p99"] <= stats["max"]
+    assert registry.slowest(limit=1)[0]["name"] == "lakebase.execute"
+
+
+def test_nested_spans_share_a_trace(registry):
+    with registry.span("genie.get_query_result") as outer:
+        with registry.span("genie.fetch_chunk") as inner:
+            pass
+
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+
+
+def test_unmeasured_payloads_stay_none(registry):
+    with registry.span("serving.query") as span:
+        span.add_rows(3)
+    with registry.span("serving.query"):
+        pass
+    with registry.span("genie.get_message"):
+        pass
+
+    summary = registry.summary()
+    assert summary["serving.query"]["rows"] == 3
+    assert summary["serving.query"]["bytes"] is None
+    assert summary["genie.get_message"]["rows"] is None
+
+
+def test_record_sums_retries_only_when_given(registry):
+    registry.record("genie.turn.first", 1.5, retries=1)
+    registry.record("genie.turn.first", 0.5)
+    registry.record("genie.turn.cached", 0.001)
+
+    summary = registry.summary()
+    assert summary["genie.turn.first"]["retries"] == 1
+    assert summary["genie.turn.first"]["sum"] == pytest.approx(2.0)
+    assert summary["genie.turn.cached"]["retries"] is None
+
+
+def test_prometheus_export_omits_unmeasured_counters_and_keeps_numeric_gauges(registry):
+    registry.record("serving.query", 0.2, rows=10)
+    registry.register_gauge("prediction_cache", lambda: {"hits": 3, "hit_ratio": 0.75, "name": "cache", "stale": True})
+    registry.register_gauge("broken", lambda: 1 / 0)
+
+    text = registry.to_prometheus()
+
+    assert 'app_operation_rows_total{operation="serving.query"} 10' in text
+    assert "app_operation_bytes_total{" not in text
+    assert 'app_gauge{source="prediction_cache",stat="hits"} 3.0' in text
+    assert 'stat="name"' not in text and 'stat="stale"' not in text
+    assert 'source="broken"' not in text
+
+
+def test_otlp_export_links_parent_spans(registry):
+    with registry.span("genie.get_query_result", message_id="m1"):
+        with registry.span("genie.fetch_chunk"):
+            pass
+
+    spans = registry.to_otlp_json()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {span["name"]: span for span in spans}
+    assert by_name["genie.fetch_chunk"]["parentSpanId"] == by_name["genie.get_query_result"]["spanId"]
+    assert {"key": "message_id", "value": {"stringValue": "m1"}} in by_name["genie.get_query_result"]["attributes"]
+
+
+def test_describe_statement_flattens_and_truncates():
+    assert describe_statement("SELECT *\n  FROM   estimations") == "SELECT * FROM estimations"
+    assert describe_statement("SELECT " + "x, " * 200, limit=20).endswith("...")
+    assert len(describe_statement("SELECT " + "x, " * 200, limit=20)) == 20
@@ -0,0 +1,71 @@
+import threading
+import types
+
+import pytest
+
+import surrogate
+
+
+class FakeSurrogate:
+    def __init__(self, formation):
+        self.formation = formation
+
+    def is_current(self, model_versions):
+        return True
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Formations built (builds.formations), with each build held until builds.release is set"""
+    built = []
+    release = threading.Event()
+
+    def build(formation):
+        release.wait(5)
+        built.append(formation)
+        return FakeSurrogate(formation)
+
+    monkeypatch.setattr(surrogate.SurrogateEstimator, "build", staticmethod(build))
+    monkeypatch.setattr(surrogate, "model_versions_now", lambda: ("1", "1"))
+    monkeypatch.setattr(surrogate, "_surrogates", {})
+    monkeypatch.setattr(surrogate, "_build_locks", {})
+    monkeypatch.setattr(surrogate, "_building", set())
+    return types.SimpleNamespace(formations=built, release=release)
+
+
+def test_concurrent_callers_build_a_formation_once(builds):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(surrogate.get_surrogate("A"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    builds.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert builds.formations == ["A"]
+    assert len({id(result) for result in results}) == 1
+
+
+def test_nowait_returns_none_until_the_background_build_finishes(builds):
+    assert surrogate.get_surrogate_nowait("A") is None
+    assert surrogate.get_surrogate_nowait("A") is None
+    assert surrogate.surrogate_stats() == {"built": 0, "building": 1}
+
+    builds.release.set()
+    for thread in threading.enumerate():
+        if thread.name == "surrogate-A":
+            thread.join(5)
+
+    assert surrogate.get_surrogate_nowait("A").formation == "A"
+    assert builds.formations == ["A"]
+
+
+def test_error_stats_are_exported_as_gauges(monkeypatch):
+    monkeypatch.setattr(surrogate, "surrogate_errors", type(surrogate.surrogate_errors)(maxlen=10))
+    surrogate.record_error("A", (110.0, 9.0), 100.0, 10.0)
+
+    stats = surrogate.metrics.gauges()["surrogate_errors"]
+
+    assert stats["count"] == 1
+    assert stats["mean_cost_error"] == pytest.approx(0.1)
+    assert stats["max_dol_error"] == pytest.approx(0.1)